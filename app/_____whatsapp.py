@@ -1,16 +1,22 @@
-from flask import Blueprint, jsonify, request, Response
-import chromadb
-from openai import OpenAI
-from chromadb.utils import embedding_functions
-from twilio.twiml.messaging_response import MessagingResponse
+from flask import Blueprint, jsonify, request
 from app.users import get_or_create_usuario
-from twilio.rest import Client
-from app.functions import count_tokens_model
+from app.functions import recortar_contexto
 from app import db
 from dotenv import load_dotenv
 import os
-from app.my_collections import mi_coleccion 
+from app.retrieval import recuperar_documentos
 from app import csrf
+from app.worker_pool import worker_pool, WHATSAPP_ASYNC
+from app.state_store import get_state_store
+from app.dedupe import get_dedupe
+from app.coalescer import MessageCoalescer
+from app.inbound import registrar_entrante, marcar_procesando, marcar_completados, marcar_fallidos, descartar
+from app.intent_engine import detectar_con_ruta_rapida
+from app.fechas import parsear_fecha, parsear_hora
+from app.answer_cache import get_answer_cache, clave_respuesta
+from app.semantic_cache import get_semantic_cache
+from app.http_clients import get_llm_client
+from app.outbound import dispatcher
 from app.___calendar_services import crear_cita
 import json
 import re
@@ -20,23 +26,19 @@ from datetime import datetime, timedelta
 load_dotenv()
 MODEL = os.getenv("MODEL_NAME", "grok-3")
 TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
-account_sid = os.getenv('TWILIO_ACCOUNT_SID') 
-auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-twilio_client = Client(account_sid, auth_token)
-#client_openai = OpenAI()
-client_openai = OpenAI(
-    api_key=os.getenv("XAI_API_KEY"),
-    base_url="https://api.x.ai/v1"
-)
 bp = Blueprint('whatsapp', __name__)
 
 
-# Estructura para mantener el estado de la conversación
-# En producción, esto debería estar en Redis o en la base de datos
-conversation_states = {}
+def detectar_intencion(mensaje):
+    """
+    Detecta la intención del usuario con reglas locales y, si la confianza
+    no alcanza el umbral, con GPT.
+    Retorna: dict con 'intencion' y 'entidades' extraídas
+    """
+    return detectar_con_ruta_rapida(mensaje, detectar_intencion_llm)
 
 
-def detectar_intencion(mensaje):
+def detectar_intencion_llm(mensaje):
     """
     Detecta la intención del usuario usando GPT.
     Retorna: dict con 'intencion' y 'entidades' extraídas
@@ -65,7 +67,7 @@ Ejemplos:
 """
     
     try:
-        response = client_openai.chat.completions.create(
+        response = get_llm_client("xai").chat.completions.create(
             model=os.getenv('MODEL_NAME'),
             messages=[
                 {"role": "system", "content": "Eres un asistente que extrae intenciones y entidades de mensajes. Responde SOLO con JSON válido."},
@@ -85,8 +87,13 @@ Ejemplos:
 
 def validar_y_normalizar_fecha(fecha_texto, mensaje_original):
     """
-    Valida y convierte fechas relativas (hoy, mañana, lunes) a formato YYYY-MM-DD
+    Valida y convierte fechas relativas (hoy, mañana, lunes) a formato YYYY-MM-DD.
+    Usa el parser local y solo consulta al LLM si no reconoce el texto.
     """
+    fecha_local = parsear_fecha(fecha_texto)
+    if fecha_local:
+        return fecha_local
+
     prompt = f"""
 Convierte la siguiente referencia de fecha al formato YYYY-MM-DD.
 Hoy es {datetime.now().strftime('%Y-%m-%d')} ({datetime.now().strftime('%A')}).
@@ -103,7 +110,7 @@ Ejemplos:
 """
     
     try:
-        response = client_openai.chat.completions.create(
+        response = get_llm_client("xai").chat.completions.create(
             model=os.getenv('MODEL_NAME'),
             messages=[
                 {"role": "system", "content": "Convierte fechas a formato YYYY-MM-DD."},
@@ -124,35 +131,18 @@ def validar_y_normalizar_hora(hora_texto):
     """
     Convierte formatos de hora variados a HH:MM formato 24h
     """
-    # Patrones comunes
-    patrones = [
-        (r'(\d{1,2})\s*(?:de la\s*)?(?:pm|p\.m\.|tarde)', lambda m: f"{int(m.group(1)) + 12 if int(m.group(1)) < 12 else int(m.group(1))}:00"),
-        (r'(\d{1,2})\s*(?:am|a\.m\.|mañana)', lambda m: f"{int(m.group(1)):02d}:00"),
-        (r'(\d{1,2}):(\d{2})', lambda m: f"{int(m.group(1)):02d}:{m.group(2)}"),
-        (r'(\d{1,2})\s*h', lambda m: f"{int(m.group(1)):02d}:00"),
-    ]
-    
-    hora_lower = hora_texto.lower()
-    for patron, convertir in patrones:
-        match = re.search(patron, hora_lower)
-        if match:
-            try:
-                hora = convertir(match)
-                # Validar formato HH:MM
-                datetime.strptime(hora, '%H:%M')
-                return hora
-            except:
-                continue
-    
-    return None
+    return parsear_hora(hora_texto)
 
 
-def gestionar_flujo_cita(usuario, mensaje, state):
+def gestionar_flujo_cita(usuario, mensaje, state, intencion_data=None):
     """
-    Gestiona el flujo conversacional para agendar una cita
+    Gestiona el flujo conversacional para agendar una cita.
+    Si el turno ya extrajo intención y entidades del mensaje, se reciben en
+    `intencion_data` y no se vuelve a llamar al LLM.
     """
-    # Extraer información del mensaje actual
-    intencion_data = detectar_intencion(mensaje)
+    # Extraer información del mensaje actual (una sola vez por mensaje)
+    if intencion_data is None:
+        intencion_data = detectar_intencion(mensaje)
     entidades = intencion_data.get('entidades', {})
     
     # Actualizar state con nuevas entidades
@@ -241,19 +231,16 @@ Te enviaremos recordatorios antes de tu cita. ¿Hay algo más en lo que pueda ay
 
 
 def recuperar_contexto(pregunta, top_k=3):
-    results = mi_coleccion.query(
-        query_texts=[pregunta],
-        n_results=top_k
-    )
-    docs = results["documents"][0]
+    _, docs = recuperar_documentos(pregunta, top_k=top_k)
     print(f"[Debug] Docs para pregunta «{pregunta}»: {docs}")
     return docs
 
 
-def generar_respuesta(pregunta, contexto_docs, saludo: str = ""):
+def construir_prompt_respuesta(pregunta, contexto_docs, saludo: str = ""):
     contexto_list = contexto_docs if isinstance(contexto_docs, list) else [contexto_docs]
+    contexto_list = recortar_contexto(contexto_list)
     contexto_text = "\n---\n".join(contexto_list)
-    prompt = f"""
+    return f"""
 Instrucción al asistente:  
     {saludo if saludo else ""}
     Actúa como Oberoende, un asesor empresarial experto en chatbots, integraciones y automatización. Responde de forma profesional, en un solo párrafo claro, evitando jerga técnica innecesaria.
@@ -264,8 +251,11 @@ Información de referencia:
 Consulta del usuario: {pregunta}
 
 Tu respuesta:"""
-    
-    response = client_openai.chat.completions.create(
+
+
+def generar_respuesta(pregunta, contexto_docs, saludo: str = ""):
+    prompt = construir_prompt_respuesta(pregunta, contexto_docs, saludo)
+    response = get_llm_client("xai").chat.completions.create(
         model=os.getenv('MODEL_NAME'),  
         messages=[
             {"role": "system", "content": "Eres Oberoende, el asistente de la empresa."},
@@ -277,24 +267,67 @@ Tu respuesta:"""
     return respuesta_texto
 
 
-def enviar_whatsapp(to_number, body_text):
-    message = twilio_client.messages.create(
-        from_=TWILIO_WHATSAPP_NUMBER,
-        to=to_number,
-        body=body_text
+def generar_respuesta_stream(pregunta, contexto_docs, saludo: str = ""):
+    """
+    Igual que generar_respuesta, pero devuelve los tokens a medida que llegan.
+    """
+    prompt = construir_prompt_respuesta(pregunta, contexto_docs, saludo)
+    stream = get_llm_client("xai").chat.completions.create(
+        model=os.getenv('MODEL_NAME'),
+        messages=[
+            {"role": "system", "content": "Eres Oberoende, el asistente de la empresa."},
+            {"role": "user", "content": prompt}
+        ],
+        max_completion_tokens=300,
+        stream=True
     )
-    return message.sid
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 
-@bp.route("/whatsapp_webhook", methods=["POST"])
-@csrf.exempt
-def whatsapp_webhook():
-    from_number = request.form.get("From")
-    body = request.form.get("Body")
-    
-    if not from_number or not body:
-        return ("Bad request - Faltan parámetros", 400)
-    
+def responder_consulta(pregunta, saludo: str = "", intencion: str = "consulta_general"):
+    """
+    Responde una consulta general con RAG, reutilizando respuestas cacheadas:
+    primero por similitud semántica y luego por pregunta y documentos recuperados.
+    """
+    # El saludo personaliza la respuesta, así que esas no se cachean
+    semantica = get_semantic_cache()
+    usar_semantica = semantica is not None and not saludo and semantica.habilitado_para(intencion)
+    if usar_semantica:
+        respuesta = semantica.buscar(pregunta)
+        if respuesta:
+            return respuesta
+
+    doc_ids, docs = recuperar_documentos(pregunta, top_k=3)
+    print(f"[Debug] Docs para pregunta «{pregunta}»: {doc_ids}")
+
+    cache = get_answer_cache()
+    clave = clave_respuesta(pregunta, doc_ids, docs)
+    if not saludo:
+        respuesta = cache.get(clave)
+        if respuesta:
+            return respuesta
+
+    respuesta = generar_respuesta(pregunta, docs, saludo=saludo)
+    if not saludo and respuesta:
+        cache.set(clave, respuesta)
+        if usar_semantica:
+            semantica.guardar(pregunta, respuesta)
+    return respuesta
+
+
+def enviar_whatsapp(to_number, body_text):
+    # Pasa por la cola de salida (rate limit y reintentos) y espera el SID
+    return dispatcher.enviar_y_esperar(to_number, body_text, from_=TWILIO_WHATSAPP_NUMBER)
+
+
+def resolver_turno(from_number, body):
+    """
+    Resuelve un turno de conversación (intención, flujo de cita o RAG).
+    Retorna el texto de respuesta, sin enviarlo.
+    """
+    respuesta = ""
     usuario = get_or_create_usuario(from_number)
     
     # Saludo condicionado
@@ -305,78 +338,154 @@ def whatsapp_webhook():
     else:
         saludo = ""
     
-    # Obtener o inicializar estado de conversación
-    user_state = conversation_states.get(from_number, {
-        'intencion': None,
-        'data': {}
-    })
+    # Obtener o inicializar estado de conversación (atómico por número)
+    store = get_state_store()
+    with store.lock(from_number):
+        user_state = store.get(from_number) or {
+            'intencion': None,
+            'data': {}
+        }
     
-    # Detectar intención si no hay una activa
-    if not user_state['intencion']:
-        intencion_data = detectar_intencion(body)
-        intencion = intencion_data['intencion']
+        # Detectar intención si no hay una activa
+        if not user_state['intencion']:
+            intencion_data = detectar_intencion(body)
+            intencion = intencion_data['intencion']
         
-        if intencion == 'agendar_cita':
-            user_state['intencion'] = 'agendar_cita'
-            user_state['data'] = intencion_data.get('entidades', {})
-            conversation_states[from_number] = user_state
+            if intencion == 'agendar_cita':
+                user_state['intencion'] = 'agendar_cita'
+                user_state['data'] = intencion_data.get('entidades', {})
+                store.set(from_number, user_state)
             
-            resultado = gestionar_flujo_cita(usuario, body, user_state['data'])
-            respuesta = resultado['respuesta']
+                resultado = gestionar_flujo_cita(usuario, body, user_state['data'], intencion_data)
+                respuesta = resultado['respuesta']
             
-            if resultado['completado']:
-                # Limpiar estado
-                conversation_states.pop(from_number, None)
-            else:
-                # Actualizar estado
-                user_state['data'] = resultado['state']
-                conversation_states[from_number] = user_state
+                if resultado['completado']:
+                    # Limpiar estado
+                    store.delete(from_number)
+                else:
+                    # Actualizar estado
+                    user_state['data'] = resultado['state']
+                    store.set(from_number, user_state)
         
-        elif intencion == 'cancelar_cita':
-            # TODO: Implementar flujo de cancelación
-            respuesta = "Para cancelar tu cita, por favor contáctanos al teléfono de la clínica. Estamos trabajando en habilitar esta función pronto."
-            conversation_states.pop(from_number, None)
+            elif intencion == 'cancelar_cita':
+                # TODO: Implementar flujo de cancelación
+                respuesta = "Para cancelar tu cita, por favor contáctanos al teléfono de la clínica. Estamos trabajando en habilitar esta función pronto."
+                store.delete(from_number)
         
-        elif intencion == 'reprogramar_cita':
-            # TODO: Implementar flujo de reprogramación
-            respuesta = "Para reprogramar tu cita, por favor contáctanos al teléfono de la clínica. Estamos trabajando en habilitar esta función pronto."
-            conversation_states.pop(from_number, None)
+            elif intencion == 'reprogramar_cita':
+                # TODO: Implementar flujo de reprogramación
+                respuesta = "Para reprogramar tu cita, por favor contáctanos al teléfono de la clínica. Estamos trabajando en habilitar esta función pronto."
+                store.delete(from_number)
         
-        else:
-            # Consulta general - usar RAG normal
-            contexto = recuperar_contexto(body, top_k=3)
-            respuesta = generar_respuesta(body, contexto, saludo=saludo)
+            else:
+                # Consulta general - usar RAG normal; la intención decide si se usa la caché semántica
+                respuesta = responder_consulta(body, saludo=saludo, intencion=intencion)
     
-    else:
-        # Continuar con flujo activo
-        if user_state['intencion'] == 'agendar_cita':
-            resultado = gestionar_flujo_cita(usuario, body, user_state['data'])
-            respuesta = resultado['respuesta']
+        else:
+            # Continuar con flujo activo
+            if user_state['intencion'] == 'agendar_cita':
+                resultado = gestionar_flujo_cita(usuario, body, user_state['data'])
+                respuesta = resultado['respuesta']
             
-            if resultado['completado']:
-                conversation_states.pop(from_number, None)
-            else:
-                user_state['data'] = resultado['state']
-                conversation_states[from_number] = user_state
+                if resultado['completado']:
+                    store.delete(from_number)
+                else:
+                    user_state['data'] = resultado['state']
+                    store.set(from_number, user_state)
+
+    if not respuesta or respuesta.strip() == "":
+        respuesta = "No tengo información suficiente para responder en este momento."
+    return respuesta
+
+
+def procesar_mensaje(from_number, body, message_sids=None):
+    """
+    Procesa un turno completo y envía la respuesta por WhatsApp.
+    Se usa desde el pool de workers cuando el webhook es asíncrono y al reentregar
+    mensajes guardados; `message_sids` son los mensajes de Twilio que cubre el turno.
+    """
+    message_sids = message_sids or []
+    marcar_procesando(message_sids)
+    try:
+        respuesta = resolver_turno(from_number, body)
+        codigo_de_envio = enviar_whatsapp(to_number=from_number, body_text=respuesta)
+    except Exception as e:
+        # Queda fallido para la reentrega; también se permite que un reintento de Twilio lo procese
+        marcar_fallidos(message_sids, e)
+        for sid in message_sids:
+            get_dedupe().liberar(sid)
+        raise
+    print(f"[INFO] Mensaje enviado. SID: {codigo_de_envio}")
+    marcar_completados(message_sids)
+    for sid in message_sids:
+        get_dedupe().completar(sid, {"status": "ok", "mensaje_enviado": respuesta})
+    return respuesta
+
+
+# Agrupa ráfagas de mensajes del mismo número en un solo turno
+coalescer = MessageCoalescer(procesar_mensaje)
+
+
+@bp.route("/whatsapp_webhook", methods=["POST"])
+@csrf.exempt
+def whatsapp_webhook():
+    from_number = request.form.get("From")
+    body = request.form.get("Body")
+    
+    if not from_number or not body:
+        return ("Bad request - Faltan parámetros", 400)
+    
+    # Reintentos de Twilio: devolver el resultado previo sin volver a procesar
+    message_sid = request.form.get("MessageSid")
+    dedupe = get_dedupe()
+    if message_sid:
+        es_nuevo, resultado_previo = dedupe.reclamar(message_sid)
+        if not es_nuevo:
+            print(f"[INFO] Mensaje duplicado {message_sid}, se omite")
+            return jsonify(resultado_previo), 200
+    
+    # Si se confirma antes de procesar, el mensaje se guarda primero para reentregarlo si el proceso cae
+    if message_sid and (coalescer.activo or WHATSAPP_ASYNC):
+        registrar_entrante(message_sid, from_number, body)
+    
+    # Agrupar ráfagas: se confirma de inmediato y el turno sale al cerrar la ventana
+    if coalescer.activo:
+        coalescer.agregar(from_number, body, message_sid)
+        return jsonify({"status": "accepted"}), 200
+    
+    # Modo asíncrono: confirmar a Twilio de inmediato y procesar en segundo plano
+    if WHATSAPP_ASYNC:
+        sids = [message_sid] if message_sid else None
+        if not worker_pool.submit(procesar_mensaje, from_number, body, sids):
+            print(f"[ERROR] Cola de mensajes llena, se rechaza mensaje de {from_number}")
+            if message_sid:
+                dedupe.liberar(message_sid)
+                descartar([message_sid])
+            return jsonify({"status": "busy"}), 503, {"Retry-After": "5"}
+        return jsonify({"status": "accepted"}), 200
+    
+    try:
+        respuesta = resolver_turno(from_number, body)
+    except Exception:
+        if message_sid:
+            dedupe.liberar(message_sid)
+        raise
     
     # Enviar respuesta
     try:
-        if not respuesta or respuesta.strip() == "":
-            respuesta = "No tengo información suficiente para responder en este momento."
-        
         codigo_de_envio = enviar_whatsapp(to_number=from_number, body_text=respuesta)
         print(f"[INFO] Mensaje enviado. SID: {codigo_de_envio}")
     except Exception as e:
         print(f"[ERROR] Error enviando WhatsApp: {e}")
+        if message_sid:
+            dedupe.liberar(message_sid)
         return jsonify({"status": "error", "mensaje": str(e)}), 500
     
-    return jsonify({"status": "ok", "mensaje_enviado": respuesta})
+    resultado = {"status": "ok", "mensaje_enviado": respuesta}
+    if message_sid:
+        dedupe.completar(message_sid, resultado)
+    return jsonify(resultado)
 
 
 def send_whatsapp_message(to_whatsapp_number, message_text):
-    message = twilio_client.messages.create(
-        from_=os.getenv('TWILIO_WHATSAPP_NUMBER'),
-        to=to_whatsapp_number,
-        body=message_text
-    )
-    return message.sid
\ No newline at end of file
+    return dispatcher.enviar_y_esperar(to_whatsapp_number, message_text)
\ No newline at end of file
@@ -33,6 +33,8 @@ def create_app():
     from app.my_collections import bp as my_collections_bp
     from app.users import bp as users_bp
     from app.calendly_webhook import bp as calendly_bp
+    from app.chat_stream import bp as chat_stream_bp
+    from app.readiness import bp as readiness_bp
 
     app.register_blueprint(calendly_bp)
     app.register_blueprint(appointments_bp)
@@ -40,6 +42,21 @@ def create_app():
     app.register_blueprint(whatsapp_bp)
     app.register_blueprint(my_collections_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(chat_stream_bp)
+    app.register_blueprint(readiness_bp)
+
+    # Recordatorios de citas en segundo plano (solo si REMINDERS_ENABLED)
+    from app.reminders import iniciar_scheduler_recordatorios
+    iniciar_scheduler_recordatorios(app)
+
+    # Mensajes de WhatsApp ya confirmados a Twilio que no llegaron a completarse
+    from app._____whatsapp import procesar_mensaje
+    from app.inbound import iniciar_reentrega
+    iniciar_reentrega(app, procesar_mensaje)
+
+    # Índice vectorial y clientes: se crean en segundo plano con WARMUP_ON_START o al primer /ready
+    from app.readiness import iniciar_warmup
+    iniciar_warmup(app)
     
     
     return app
\ No newline at end of file
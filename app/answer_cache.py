@@ -0,0 +1,156 @@
+# app/answer_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.intent_engine import normalizar
+from app.state_store import REDIS_URL
+
+load_dotenv()
+
+# Backend de la caché de respuestas: memory | redis | off
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+
+def clave_respuesta(pregunta, doc_ids, documentos):
+    """
+    Clave de caché: pregunta normalizada más los documentos recuperados, cada uno con
+    el hash de su contenido. Si se edita un documento (aunque conserve su id) o la
+    recuperación trae otros, la clave cambia y la entrada vieja deja de usarse.
+    """
+    huellas = sorted(
+        f"{id_}:{hashlib.sha256(documento.encode('utf-8')).hexdigest()}"
+        for id_, documento in zip(doc_ids, documentos)
+    )
+    base = normalizar(pregunta) + "|" + ",".join(huellas)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+class _Contadores:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class MemoryAnswerCache(_Contadores):
+    """
+    Caché de respuestas en memoria del proceso, con expiración y límite LRU.
+    """
+
+    def __init__(self, ttl=ANSWER_CACHE_TTL_SECONDS, max_entradas=ANSWER_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # clave -> (expira_en, respuesta)
+        self._mutex = threading.Lock()
+
+    def get(self, clave):
+        with self._mutex:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self._datos.pop(clave, None)
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def set(self, clave, respuesta):
+        with self._mutex:
+            self._datos[clave] = (time.monotonic() + self.ttl, respuesta)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._mutex:
+            self._datos.pop(clave, None)
+
+    def estadisticas(self):
+        return {**super().estadisticas(), "entradas": len(self._datos)}
+
+
+class RedisAnswerCache(_Contadores):
+    """
+    Caché de respuestas compartida entre workers en un servidor compatible con Redis.
+    La expiración usa el TTL de cada clave; el desalojo LRU depende de maxmemory-policy.
+    """
+
+    def __init__(self, url=REDIS_URL, ttl=ANSWER_CACHE_TTL_SECONDS, prefijo="resp:"):
+        super().__init__()
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefijo = prefijo
+
+    def get(self, clave):
+        valor = self._redis.get(f"{self.prefijo}{clave}")
+        if valor is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return valor.decode("utf-8")
+
+    def set(self, clave, respuesta):
+        self._redis.set(f"{self.prefijo}{clave}", respuesta, ex=self.ttl)
+
+    def invalidar(self, clave):
+        self._redis.delete(f"{self.prefijo}{clave}")
+
+
+class NullAnswerCache(_Contadores):
+    """
+    Caché desactivada: nunca encuentra nada.
+    """
+
+    def get(self, clave):
+        self.misses += 1
+        return None
+
+    def set(self, clave, respuesta):
+        pass
+
+    def invalidar(self, clave):
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """
+    Retorna la caché configurada en ANSWER_CACHE_BACKEND, creándola en el primer uso.
+    """
+    global _cache
+    if _cache is not None:
+        return _cache
+    with _cache_lock:
+        if _cache is None:
+            if ANSWER_CACHE_BACKEND == "redis":
+                _cache = RedisAnswerCache()
+            elif ANSWER_CACHE_BACKEND == "off":
+                _cache = NullAnswerCache()
+            else:
+                _cache = MemoryAnswerCache()
+    return _cache
+
+
+def invalidar_respuesta(pregunta, doc_ids, documentos):
+    """
+    Elimina la respuesta cacheada para una pregunta y sus documentos.
+    """
+    get_answer_cache().invalidar(clave_respuesta(pregunta, doc_ids, documentos))
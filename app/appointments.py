@@ -1,57 +1,89 @@
+import base64
+import csv
+import io
+import json
+import os
 from datetime import date, datetime, time
-from flask import jsonify, request, Blueprint
+from flask import jsonify, request, Blueprint, Response, stream_with_context
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from app.models import Appointment, db
 
 
 bp  = Blueprint('appointments', __name__, url_prefix='/appointments')
 
-@bp.route("/appointments", methods=["POST"])
-def create_appointment():
-    data = request.get_json()
-    name = data.get("name")
-    phone = data.get("phone")
-    service = data.get("service")
-    date_str = data.get("date")   # espera "YYYY-MM-DD"
-    time_str = data.get("time")   # espera "HH:MM:SS"
+# Horario de atención permitido (ejemplo: 9:00 a 19:00)
+HORA_INICIO = time(hour=9, minute=0, second=0)
+HORA_FIN = time(hour=19, minute=0, second=0)
+# Máximo de citas por llamada al endpoint masivo
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+# Tamaño de página del listado y filas por lote del cursor de exportación
+LIST_PAGE_SIZE = int(os.getenv("APPOINTMENTS_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("APPOINTMENTS_MAX_PAGE_SIZE", "500"))
+EXPORT_YIELD_PER = int(os.getenv("APPOINTMENTS_EXPORT_YIELD_PER", "1000"))
+
+VALID_STATUSES = {"pending", "confirmed", "canceled", "no_show"}
+
+
+def es_choque_de_horario(error: IntegrityError) -> bool:
+    """
+    True si la violación es del índice único de horarios activos. MySQL y PostgreSQL
+    nombran el índice en el mensaje; SQLite lista sus columnas.
+    """
+    mensaje = str(error.orig)
+    return "uq_appointment_slot_activo" in mensaje or "appointment.slot_activo" in mensaje
 
-    # Validación de campos obligatorios
-    if not all([name, phone, service, date_str, time_str]):
-        return jsonify({"error": "Faltan datos requeridos"}), 400
 
-    # Validar formato de fecha y hora
+def validar_fecha_hora(date_str, time_str, reprogramar=False):
+    """
+    Aplica las reglas de reserva: formato, fecha no pasada, horario de atención
+    e intervalos de 30 minutos. Retorna (fecha, hora, error).
+    """
     try:
         date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        return jsonify({"error": "Formato de fecha inválido, use YYYY-MM-DD"}), 400
+    except (TypeError, ValueError):
+        return None, None, "Formato de fecha inválido, use YYYY-MM-DD"
 
     try:
         time_obj = datetime.strptime(time_str, "%H:%M:%S").time()
-    except ValueError:
-        return jsonify({"error": "Formato de hora inválido, use HH:MM:SS"}), 400
+    except (TypeError, ValueError):
+        return None, None, "Formato de hora inválido, use HH:MM:SS"
 
     # Validar que la fecha no esté en el pasado
-    today = date.today()
-    if date_obj < today:
-        return jsonify({"error": "No se puede reservar para fechas pasadas"}), 400
+    if date_obj < date.today():
+        return None, None, "No se puede reprogramar a una fecha pasada" if reprogramar \
+            else "No se puede reservar para fechas pasadas"
 
-    # Validar horario de atención permitido (ejemplo: 9:00 a 19:00)
-    hora_inicio = time(hour=9, minute=0, second=0)
-    hora_fin = time(hour=19, minute=0, second=0)
-    if not (hora_inicio <= time_obj <= hora_fin):
-        return jsonify({"error": "Hora fuera del horario de atención"}), 400
+    if not (HORA_INICIO <= time_obj <= HORA_FIN):
+        return None, None, "Hora fuera del horario de atención"
 
     # Validar que la cita sea múltiplo de 30 minutos (ejemplos: :00 o :30)
     if time_obj.minute % 30 != 0 or time_obj.second != 0:
-        return jsonify({"error": "La cita debe ser en intervalos de 30 minutos"}), 400
+        return None, None, "La reprogramación debe ser en intervalos de 30 minutos" if reprogramar \
+            else "La cita debe ser en intervalos de 30 minutos"
 
-    # Verificar solapamientos (otra cita en misma fecha y hora y estado que no sea cancelado)
-    existing = Appointment.query.filter_by(date=date_obj, time=time_obj)\
-        .filter(Appointment.status != 'canceled')\
-        .first()
-    if existing:
-        return jsonify({"error": "Ya hay una cita en ese horario"}), 409
+    return date_obj, time_obj, None
+
+
+@bp.route("/appointments", methods=["POST"])
+def create_appointment():
+    data = request.get_json()
+    name = data.get("name")
+    phone = data.get("phone")
+    service = data.get("service")
+    date_str = data.get("date")   # espera "YYYY-MM-DD"
+    time_str = data.get("time")   # espera "HH:MM:SS"
+
+    # Validación de campos obligatorios
+    if not all([name, phone, service, date_str, time_str]):
+        return jsonify({"error": "Faltan datos requeridos"}), 400
+
+    # Validar formato, fecha no pasada, horario de atención e intervalos de 30 minutos
+    date_obj, time_obj, error = validar_fecha_hora(date_str, time_str)
+    if error:
+        return jsonify({"error": error}), 400
 
-    # Si todo pasa, crear la cita
+    # Crear la cita; el índice único de horarios activos rechaza el solapamiento
     new_app = Appointment(
         patient_name=name,
         patient_phone=phone,
@@ -61,12 +93,16 @@ def create_appointment():
         status='pending'
     )
     db.session.add(new_app)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not es_choque_de_horario(e):
+            raise
+        return jsonify({"error": "Ya hay una cita en ese horario"}), 409
 
     return jsonify({"message": "Cita creada", "appointment_id": new_app.id}), 201
 
-VALID_STATUSES = {"pending", "confirmed", "canceled", "no_show"}
-
 @bp.route("/appointments/<int:app_id>", methods=["PUT"])
 def update_appointment(app_id):
     data = request.get_json()
@@ -87,45 +123,21 @@ def update_appointment(app_id):
 
     # Si se pide reprogramar fecha/hora juntos:
     if new_date_str is not None and new_time_str is not None:
-        # Validar formato
-        try:
-            new_date = datetime.strptime(new_date_str, "%Y-%m-%d").date()
-        except ValueError:
-            return jsonify({"error": "Formato de fecha inválido, use YYYY-MM-DD"}), 400
+        new_date, new_time, error = validar_fecha_hora(new_date_str, new_time_str, reprogramar=True)
+        if error:
+            return jsonify({"error": error}), 400
 
-        try:
-            new_time = datetime.strptime(new_time_str, "%H:%M:%S").time()
-        except ValueError:
-            return jsonify({"error": "Formato de hora inválido, use HH:MM:SS"}), 400
-
-        # Validar fecha no pasada
-        if new_date < date.today():
-            return jsonify({"error": "No se puede reprogramar a una fecha pasada"}), 400
-
-        # Validar horario permitido (ej: 9:00 a 19:00)
-        hora_inicio = time(9, 0, 0)
-        hora_fin = time(19, 0, 0)
-        if not (hora_inicio <= new_time <= hora_fin):
-            return jsonify({"error": "Hora fuera del horario de atención"}), 400
-
-        # Validar múltiplo de 30 minutos
-        if new_time.minute % 30 != 0 or new_time.second != 0:
-            return jsonify({"error": "La reprogramación debe ser en intervalos de 30 minutos"}), 400
-
-        # Verificar que no hay otra cita en ese horario
-        conflict = Appointment.query.filter_by(date=new_date, time=new_time)\
-            .filter(Appointment.status != 'canceled')\
-            .first()
-        # Si la cita conflictiva no es la misma que estamos actualizando
-        if conflict and conflict.id != appdb.id:
-            return jsonify({"error": "Ya existe otra cita en ese horario"}), 409
-
-        # Si todo bien, asignar
         appdb.date = new_date
         appdb.time = new_time
 
-    # Guardar cambios
-    db.session.commit()
+    # Guardar cambios; si el horario (o reactivar una cancelada) choca con otra cita, el índice único lo rechaza
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not es_choque_de_horario(e):
+            raise
+        return jsonify({"error": "Ya existe otra cita en ese horario"}), 409
 
     return jsonify({
         "message": "Cita actualizada",
@@ -134,3 +146,277 @@ def update_appointment(app_id):
         "new_time": str(appdb.time),
         "status": appdb.status
     }), 200
+
+
+def _validar_item(item, existentes):
+    """
+    Valida un item del lote. Sin "id" es una cita nueva (mismos campos que create_appointment);
+    con "id" es una actualización (mismos campos que update_appointment).
+    Retorna (cambios, error).
+    """
+    if not isinstance(item, dict):
+        return None, "Cada item debe ser un objeto"
+    status = item.get("status")
+    if status is not None and status not in VALID_STATUSES:
+        return None, f"Estado inválido. Debe ser uno de {list(VALID_STATUSES)}"
+
+    if item.get("id") is None:
+        campos = [item.get(c) for c in ("name", "phone", "service", "date", "time")]
+        if not all(campos):
+            return None, "Faltan datos requeridos"
+        date_obj, time_obj, error = validar_fecha_hora(item["date"], item["time"])
+        if error:
+            return None, error
+        return {"patient_name": item["name"], "patient_phone": item["phone"], "service_type": item["service"],
+                "date": date_obj, "time": time_obj, "status": status or "pending"}, None
+
+    cita = existentes.get(item["id"])
+    if cita is None:
+        return None, "Cita no encontrada"
+    cambios = {"date": cita.date, "time": cita.time, "status": status or cita.status}
+    if item.get("date") is not None and item.get("time") is not None:
+        cambios["date"], cambios["time"], error = validar_fecha_hora(item["date"], item["time"], reprogramar=True)
+        if error:
+            return None, error
+    return cambios, None
+
+
+def _conflictos(validos, originales):
+    """
+    Marca los items que chocan entre sí o con citas activas de la base, con una sola consulta.
+    `originales` es {indice: (date, time)} con el horario activo actual de cada actualización.
+    Retorna {indice: error}.
+    """
+    errores, ocupados = {}, {}
+    for indice, cambios in validos.items():
+        if cambios["status"] == "canceled":
+            continue
+        slot = (cambios["date"], cambios["time"])
+        if slot in ocupados:
+            errores[indice] = f"Choca con el item {ocupados[slot]} del lote"
+        else:
+            ocupados[slot] = indice
+    if ocupados:
+        # Las citas que el lote actualiza ya no ocupan su horario anterior
+        tomados = db.session.query(Appointment.date, Appointment.time).filter(
+            Appointment.slot_activo.is_(True),
+            tuple_(Appointment.date, Appointment.time).in_(list(ocupados)),
+        )
+        ids_actualizados = [validos[i]["id"] for i in validos if "id" in validos[i]]
+        if ids_actualizados:
+            tomados = tomados.filter(Appointment.id.notin_(ids_actualizados))
+        for slot in tomados:
+            errores[ocupados[tuple(slot)]] = "Ya hay una cita en ese horario"
+
+    # Una actualización rechazada conserva su horario: el item que pensaba ocuparlo
+    # también se rechaza, y así en cadena
+    pendientes = [i for i in errores if i in originales]
+    while pendientes:
+        indice = ocupados.get(originales[pendientes.pop()])
+        if indice is not None and indice not in errores:
+            errores[indice] = "El horario lo libera otro item del lote que no se pudo aplicar"
+            if indice in originales:
+                pendientes.append(indice)
+    return errores
+
+
+def guardar_citas_en_lote(items):
+    """
+    Crea o actualiza un lote de citas en una sola transacción.
+    Los items inválidos o en conflicto se informan y no se escriben; el resto sí.
+    Las actualizaciones pueden intercambiar horarios o correrlos en cadena dentro del lote.
+    Retorna {"creadas": [...], "actualizadas": [...], "errores": [{"indice", "error"}]}.
+    """
+    ids = [item["id"] for item in items if isinstance(item, dict) and item.get("id") is not None]
+    # Dos intentos: si otra petición toma un horario entre la verificación y el commit,
+    # el índice único aborta la transacción y se recalculan los conflictos
+    for intento in range(2):
+        existentes = {c.id: c for c in Appointment.query.filter(Appointment.id.in_(ids))} if ids else {}
+        errores, validos, originales = {}, {}, {}
+        for indice, item in enumerate(items):
+            cambios, error = _validar_item(item, existentes)
+            if error:
+                errores[indice] = error
+                continue
+            validos[indice] = cambios
+            if item.get("id") is not None:
+                cambios["id"] = item["id"]
+                cita = existentes[item["id"]]
+                if cita.slot_activo:
+                    originales[indice] = (cita.date, cita.time)
+        errores.update(_conflictos(validos, originales))
+
+        nuevas, actualizadas = [], []
+        for indice, cambios in validos.items():
+            if indice in errores:
+                continue
+            if "id" not in cambios:
+                nuevas.append((indice, Appointment(**cambios)))
+            else:
+                actualizadas.append((indice, existentes[cambios.pop("id")], cambios))
+        try:
+            # El índice único se verifica fila a fila: primero se liberan los horarios
+            # de las citas que se mueven o se cancelan y después se escriben los nuevos valores
+            movidas = [cita for _, cita, cambios in actualizadas
+                       if (cita.date, cita.time) != (cambios["date"], cambios["time"])
+                       or cambios["status"] == "canceled"]
+            if movidas:
+                for cita in movidas:
+                    cita.slot_activo = None
+                db.session.flush()
+            for _, cita, cambios in actualizadas:
+                for campo, valor in cambios.items():
+                    setattr(cita, campo, valor)
+            db.session.add_all([cita for _, cita in nuevas])
+            db.session.commit()
+            break
+        except IntegrityError as e:
+            db.session.rollback()
+            if intento or not es_choque_de_horario(e):
+                raise
+    return {
+        "creadas": [{"indice": i, "appointment_id": c.id} for i, c in nuevas],
+        "actualizadas": [{"indice": i, "appointment_id": c.id} for i, c, _ in actualizadas],
+        "errores": [{"indice": i, "error": e} for i, e in sorted(errores.items())],
+    }
+
+
+@bp.route("/appointments/bulk", methods=["POST"])
+def bulk_appointments():
+    """
+    Recibe {"appointments": [...]} (o la lista directamente).
+    201 si todo se guardó, 207 si hubo errores parciales, 400 si no se guardó nada.
+    """
+    data = request.get_json()
+    items = data.get("appointments") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Se espera una lista de citas"}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({"error": f"Máximo {BULK_MAX_ITEMS} citas por lote"}), 400
+
+    try:
+        resultado = guardar_citas_en_lote(items)
+    except IntegrityError as e:
+        if not es_choque_de_horario(e):
+            raise
+        return jsonify({"error": "Conflicto con reservas concurrentes, intente de nuevo"}), 409
+
+    if not resultado["errores"]:
+        return jsonify(resultado), 201
+    if resultado["creadas"] or resultado["actualizadas"]:
+        return jsonify(resultado), 207
+    return jsonify(resultado), 400
+
+
+def _filtrar_citas(args):
+    """
+    Consulta ordenada por (date, time, id) con los filtros de la query string:
+    from / to (YYYY-MM-DD), status (uno o varios separados por coma) y phone.
+    Retorna (query, error).
+    """
+    query = Appointment.query
+    for parametro, comparar in (("from", Appointment.date.__ge__), ("to", Appointment.date.__le__)):
+        valor = args.get(parametro)
+        if valor:
+            try:
+                query = query.filter(comparar(datetime.strptime(valor, "%Y-%m-%d").date()))
+            except ValueError:
+                return None, f"Formato de '{parametro}' inválido, use YYYY-MM-DD"
+    if args.get("status"):
+        estados = [e.strip() for e in args["status"].split(",") if e.strip()]
+        if not set(estados) <= VALID_STATUSES:
+            return None, f"Estado inválido. Debe ser uno de {list(VALID_STATUSES)}"
+        query = query.filter(Appointment.status.in_(estados))
+    if args.get("phone"):
+        query = query.filter(Appointment.patient_phone == args["phone"])
+    return query.order_by(Appointment.date, Appointment.time, Appointment.id), None
+
+
+def _codificar_cursor(cita):
+    clave = [cita.date.isoformat(), cita.time.strftime("%H:%M:%S"), cita.id]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    fecha, hora, id_ = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.strptime(fecha, "%Y-%m-%d").date(), datetime.strptime(hora, "%H:%M:%S").time(), int(id_)
+
+
+@bp.route("/appointments", methods=["GET"])
+def list_appointments():
+    """
+    Listado paginado por keyset: la siguiente página se pide con ?cursor=<next_cursor>.
+    """
+    query, error = _filtrar_citas(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    try:
+        limite = min(max(int(request.args.get("limit", LIST_PAGE_SIZE)), 1), LIST_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "'limit' debe ser un número"}), 400
+
+    if request.args.get("cursor"):
+        try:
+            clave = _decodificar_cursor(request.args["cursor"])
+        except (ValueError, TypeError):
+            return jsonify({"error": "Cursor inválido"}), 400
+        query = query.filter(tuple_(Appointment.date, Appointment.time, Appointment.id) > tuple_(*clave))
+
+    # Se pide una fila extra para saber si hay otra página
+    citas = query.limit(limite + 1).all()
+    siguiente = _codificar_cursor(citas[limite - 1]) if len(citas) > limite else None
+    return jsonify({
+        "items": [c.to_dict() for c in citas[:limite]],
+        "next_cursor": siguiente
+    }), 200
+
+
+def _exportar_csv(citas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(Appointment.CAMPOS)
+    for n, cita in enumerate(citas, start=1):
+        fila = cita.to_dict()
+        escritor.writerow([fila[c] for c in Appointment.CAMPOS])
+        if n % EXPORT_YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _exportar_ndjson(citas):
+    lote = []
+    for cita in citas:
+        lote.append(json.dumps(cita.to_dict(), ensure_ascii=False))
+        if len(lote) >= EXPORT_YIELD_PER:
+            yield "\n".join(lote) + "\n"
+            lote = []
+    if lote:
+        yield "\n".join(lote) + "\n"
+
+
+@bp.route("/appointments/export", methods=["GET"])
+def export_appointments():
+    """
+    Exporta las citas filtradas como CSV (?format=csv) o NDJSON (?format=ndjson).
+    Las filas se leen con un cursor del lado del servidor, de a EXPORT_YIELD_PER,
+    y se envían a medida que llegan.
+    """
+    formato = request.args.get("format", "csv")
+    if formato not in ("csv", "ndjson"):
+        return jsonify({"error": "Formato inválido, use csv o ndjson"}), 400
+    query, error = _filtrar_citas(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    citas = query.execution_options(stream_results=True).yield_per(EXPORT_YIELD_PER)
+    if formato == "csv":
+        cuerpo, mimetype = _exportar_csv(citas), "text/csv"
+    else:
+        cuerpo, mimetype = _exportar_ndjson(citas), "application/x-ndjson"
+    return Response(
+        stream_with_context(cuerpo),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=appointments.{formato}"}
+    )
@@ -0,0 +1,263 @@
+# app/availability.py
+import bisect
+import os
+import threading
+from datetime import date, datetime, timedelta
+from dotenv import load_dotenv
+from app import db
+from app.models import Appointment, AvailabilityVersion
+
+load_dotenv()
+
+# Horario de atención por día de la semana (0 = lunes). Formato: "0-4=09:00-18:00;5=09:00-12:00"
+AVAILABILITY_OPENING = os.getenv("AVAILABILITY_OPENING", "0-4=09:00-18:00;5=09:00-12:00")
+# Pausas dentro del horario, mismo formato
+AVAILABILITY_BREAKS = os.getenv("AVAILABILITY_BREAKS", "0-4=12:00-15:00")
+# Feriados separados por coma: YYYY-MM-DD (una vez) o MM-DD (todos los años)
+AVAILABILITY_HOLIDAYS = os.getenv("AVAILABILITY_HOLIDAYS", "")
+AVAILABILITY_SLOT_MINUTES = int(os.getenv("AVAILABILITY_SLOT_MINUTES", "60"))
+# Máximo de días que recorre proximos_libres() antes de rendirse
+AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "120"))
+AVAILABILITY_CACHE_ENABLED = os.getenv("AVAILABILITY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Días guardados por proceso; al pasarse se descartan los más antiguos
+AVAILABILITY_CACHE_MAX_DAYS = int(os.getenv("AVAILABILITY_CACHE_MAX_DAYS", "730"))
+
+ESTADOS_OCUPADOS = ('pending', 'confirmed')
+
+
+def _minutos(hhmm: str) -> int:
+    horas, minutos = hhmm.strip().split(":")[:2]
+    return int(horas) * 60 + int(minutos)
+
+
+def _parsear_rangos(especificacion: str):
+    """
+    "0-4=09:00-12:00,15:00-18:00;5=09:00-12:00" -> {dia: [(inicio, fin)]} en minutos.
+    """
+    rangos = {}
+    for bloque in filter(None, (b.strip() for b in especificacion.split(";"))):
+        dias, horas = bloque.split("=")
+        desde, _, hasta = dias.partition("-")
+        for dia in range(int(desde), int(hasta or desde) + 1):
+            for rango in filter(None, (r.strip() for r in horas.split(","))):
+                inicio, fin = rango.split("-")
+                rangos.setdefault(dia, []).append((_minutos(inicio), _minutos(fin)))
+    return rangos
+
+
+def _parsear_feriados(especificacion: str):
+    fechas, anuales = set(), set()
+    for valor in filter(None, (v.strip() for v in especificacion.split(","))):
+        partes = [int(p) for p in valor.split("-")]
+        if len(partes) == 3:
+            fechas.add(date(*partes))
+        else:
+            anuales.add(tuple(partes))
+    return fechas, anuales
+
+
+class HorarioClinica:
+    """
+    Slots de atención por día de la semana, con pausas y feriados.
+    Los slots de cada día de la semana se calculan una sola vez.
+    """
+
+    def __init__(self, apertura=AVAILABILITY_OPENING, pausas=AVAILABILITY_BREAKS,
+                 feriados=AVAILABILITY_HOLIDAYS, duracion=AVAILABILITY_SLOT_MINUTES,
+                 cache=AVAILABILITY_CACHE_ENABLED):
+        self.duracion = duracion
+        # Los bitmaps dependen de la grilla de slots, así que cada horario tiene su caché
+        self.cache = CacheOcupacion() if cache else None
+        self.feriados, self.feriados_anuales = _parsear_feriados(feriados)
+        aperturas, cortes = _parsear_rangos(apertura), _parsear_rangos(pausas)
+        # dia de la semana -> tupla ordenada de minutos de inicio de cada slot
+        self._slots = {dia: self._calcular_slots(aperturas.get(dia, []), cortes.get(dia, [])) for dia in range(7)}
+
+    def _calcular_slots(self, aperturas, pausas):
+        slots = []
+        for inicio, fin in aperturas:
+            minuto = inicio
+            while minuto + self.duracion <= fin:
+                # Un slot que se cruza con una pausa no se ofrece
+                if not any(minuto < p_fin and minuto + self.duracion > p_inicio for p_inicio, p_fin in pausas):
+                    slots.append(minuto)
+                minuto += self.duracion
+        return tuple(sorted(set(slots)))
+
+    def es_feriado(self, fecha: date) -> bool:
+        return fecha in self.feriados or (fecha.month, fecha.day) in self.feriados_anuales
+
+    def slots(self, fecha: date):
+        return () if self.es_feriado(fecha) else self._slots[fecha.weekday()]
+
+    def indice_slot(self, fecha: date, minuto: int):
+        """
+        Posición del slot que contiene `minuto`, o None si cae fuera del horario.
+        """
+        slots = self.slots(fecha)
+        n = bisect.bisect_right(slots, minuto) - 1
+        if n >= 0 and minuto < slots[n] + self.duracion:
+            return n
+        return None
+
+
+def ocupacion(horario: HorarioClinica, desde: date, hasta: date):
+    """
+    Bitmap de slots ocupados por día ({fecha: int}, bit n = slot n ocupado)
+    para el rango [desde, hasta], con una sola consulta.
+    """
+    filas = db.session.query(Appointment.date, Appointment.time).filter(
+        Appointment.status.in_(ESTADOS_OCUPADOS),
+        Appointment.date >= desde,
+        Appointment.date <= hasta,
+    )
+    mapas = {}
+    for fecha, hora in filas:
+        n = horario.indice_slot(fecha, hora.hour * 60 + hora.minute)
+        if n is not None:
+            mapas[fecha] = mapas.get(fecha, 0) | (1 << n)
+    return mapas
+
+
+class CacheOcupacion:
+    """
+    Bitmaps de ocupación por día, cada uno con la versión de availability_version
+    con la que se calculó. Una entrada sirve mientras la versión en la base no cambie;
+    como toda escritura de citas incrementa la versión en su misma transacción,
+    el caché es válido entre workers sin backend compartido.
+    """
+
+    def __init__(self, max_dias=AVAILABILITY_CACHE_MAX_DAYS):
+        self.max_dias = max_dias
+        self._dias = {}  # fecha -> (versión, bitmap)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def ocupacion(self, horario: HorarioClinica, desde: date, hasta: date):
+        # Las versiones se leen antes que las citas: si una escritura entra en medio,
+        # el bitmap queda con una versión vieja y se recalcula en la próxima consulta
+        versiones = dict(db.session.query(AvailabilityVersion.date, AvailabilityVersion.version).filter(
+            AvailabilityVersion.date >= desde,
+            AvailabilityVersion.date <= hasta,
+        ))
+        mapas, vencidas = {}, []
+        fecha = desde
+        with self._lock:
+            while fecha <= hasta:
+                entrada = self._dias.get(fecha)
+                if entrada is not None and entrada[0] == versiones.get(fecha, 0):
+                    mapas[fecha] = entrada[1]
+                else:
+                    vencidas.append(fecha)
+                fecha += timedelta(days=1)
+            self.hits += len(mapas)
+            self.misses += len(vencidas)
+        if not vencidas:
+            return mapas
+
+        nuevos = ocupacion(horario, vencidas[0], vencidas[-1])
+        with self._lock:
+            for fecha in vencidas:
+                mapas[fecha] = nuevos.get(fecha, 0)
+                self._dias[fecha] = (versiones.get(fecha, 0), mapas[fecha])
+            if len(self._dias) > self.max_dias:
+                for fecha in sorted(self._dias)[:len(self._dias) - self.max_dias]:
+                    del self._dias[fecha]
+        return mapas
+
+    def limpiar(self):
+        with self._lock:
+            self._dias.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "dias_en_cache": len(self._dias),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def _ocupacion(horario, desde, hasta):
+    if horario.cache is None:
+        return ocupacion(horario, desde, hasta)
+    return horario.cache.ocupacion(horario, desde, hasta)
+
+
+def _libres_del_dia(horario, fecha, mapa, minimo):
+    return [m for n, m in enumerate(horario.slots(fecha)) if not (mapa >> n) & 1 and m >= minimo]
+
+
+def _hora(minuto: int) -> str:
+    return f"{minuto // 60:02d}:{minuto % 60:02d}:00"
+
+
+def calcular_disponibilidad(dias=7, desde: date = None, ahora: datetime = None, horario: HorarioClinica = None):
+    """
+    Horarios libres de los próximos `dias` días, en el formato de format_disponibilidad:
+    [{"fecha": "YYYY-MM-DD", "dia_semana": ..., "horarios": ["HH:MM:SS", ...]}].
+    Los slots de hoy que ya pasaron no se ofrecen.
+    """
+    horario = horario or get_horario()
+    ahora = ahora or datetime.now()
+    desde = desde or ahora.date()
+    hasta = desde + timedelta(days=dias - 1)
+    mapas = _ocupacion(horario, desde, hasta)
+
+    resultado = []
+    for i in range(dias):
+        fecha = desde + timedelta(days=i)
+        minimo = ahora.hour * 60 + ahora.minute if fecha == ahora.date() else 0
+        libres = _libres_del_dia(horario, fecha, mapas.get(fecha, 0), minimo)
+        if libres:
+            resultado.append({
+                "fecha": fecha.strftime("%Y-%m-%d"),
+                "dia_semana": fecha.strftime("%A"),
+                "horarios": [_hora(m) for m in libres]
+            })
+    return resultado
+
+
+def proximos_libres(n=5, desde: datetime = None, max_dias=AVAILABILITY_MAX_DAYS, horario: HorarioClinica = None):
+    """
+    Los próximos `n` slots libres como datetimes. Consulta por ventanas que se duplican
+    (7, 14, 28... días), así un pedido corto no lee meses de citas.
+    """
+    horario = horario or get_horario()
+    ahora = desde or datetime.now()
+    libres = []
+    inicio, ventana = ahora.date(), 7
+    while len(libres) < n and (inicio - ahora.date()).days < max_dias:
+        fin = min(inicio + timedelta(days=ventana - 1), ahora.date() + timedelta(days=max_dias - 1))
+        mapas = _ocupacion(horario, inicio, fin)
+        fecha = inicio
+        while fecha <= fin and len(libres) < n:
+            minimo = ahora.hour * 60 + ahora.minute if fecha == ahora.date() else 0
+            for m in _libres_del_dia(horario, fecha, mapas.get(fecha, 0), minimo)[:n - len(libres)]:
+                libres.append(datetime.combine(fecha, datetime.min.time()) + timedelta(minutes=m))
+            fecha += timedelta(days=1)
+        inicio, ventana = fin + timedelta(days=1), ventana * 2
+    return libres
+
+
+_horario = None
+
+
+def get_horario() -> HorarioClinica:
+    """
+    Horario configurado por variables de entorno, creado en el primer uso.
+    """
+    global _horario
+    if _horario is None:
+        _horario = HorarioClinica()
+    return _horario
+
+
+def estadisticas():
+    # No crea el horario: /metrics no debe disparar consultas
+    if _horario is None or _horario.cache is None:
+        return None
+    return _horario.cache.estadisticas()
@@ -1,5 +1,5 @@
 # calendar_services.py
-import requests
+from app.http_clients import get_http_session
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
@@ -58,7 +58,7 @@ def chequear_disponibilidad(doctor_uri=None, fecha_inicio=None, fecha_fin=None):
     if doctor_uri:  # Si es team event
         params['preferred_organization_user'] = doctor_uri  # URI del doctor
     
-    response = requests.get(
+    response = get_http_session("calendly").get(
         f"{CALENDLY_BASE_URL}/event_types/{CALENDLY_EVENT_TYPE_URI.split('/')[-1]}/availability",
         headers=HEADERS,
         params=params
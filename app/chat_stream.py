@@ -0,0 +1,98 @@
+# app/chat_stream.py
+import json
+import threading
+import time
+from collections import deque
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from app import csrf
+from app._____whatsapp import recuperar_contexto, generar_respuesta_stream
+
+bp = Blueprint('chat_stream', __name__)
+
+
+class MetricasStream:
+    """
+    Guarda los últimos tiempos al primer token y totales para calcular percentiles.
+    """
+
+    def __init__(self, ventana=500):
+        self._ttft = deque(maxlen=ventana)
+        self._total = deque(maxlen=ventana)
+        self._lock = threading.Lock()
+        self.solicitudes = 0
+        self.errores = 0
+
+    def registrar(self, ttft_ms, total_ms):
+        with self._lock:
+            self.solicitudes += 1
+            if ttft_ms is not None:
+                self._ttft.append(ttft_ms)
+            self._total.append(total_ms)
+
+    @staticmethod
+    def _percentil(valores, p):
+        if not valores:
+            return None
+        ordenados = sorted(valores)
+        return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))], 1)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "solicitudes": self.solicitudes,
+                "errores": self.errores,
+                "ttft_ms_p50": self._percentil(self._ttft, 0.50),
+                "ttft_ms_p95": self._percentil(self._ttft, 0.95),
+                "total_ms_p50": self._percentil(self._total, 0.50),
+                "total_ms_p95": self._percentil(self._total, 0.95),
+            }
+
+
+metricas = MetricasStream()
+
+
+@bp.route("/chat-stream", methods=["POST"])
+@csrf.exempt
+def chat_stream():
+    """
+    Responde la consulta del chat web token a token (texto plano por chunks,
+    o Server-Sent Events si el cliente pide text/event-stream).
+    """
+    inicio = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    mensaje = (data.get("message") or "").strip()
+    if not mensaje:
+        return jsonify({"error": "Falta el campo 'message'"}), 400
+
+    sse = "text/event-stream" in request.headers.get("Accept", "")
+    contexto = recuperar_contexto(mensaje, top_k=3)
+
+    def generar():
+        ttft_ms = None
+        try:
+            for token in generar_respuesta_stream(mensaje, contexto):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - inicio) * 1000
+                yield f"data: {json.dumps(token)}\n\n" if sse else token
+            if sse:
+                yield "event: fin\ndata: {}\n\n"
+        except Exception as e:
+            metricas.errores += 1
+            print(f"[ERROR] chat-stream: {e}")
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n" if sse else "\n[Error generando la respuesta]"
+        finally:
+            total_ms = (time.perf_counter() - inicio) * 1000
+            metricas.registrar(ttft_ms, total_ms)
+            ttft_texto = f"{ttft_ms:.0f}" if ttft_ms is not None else "-"
+            print(f"[INFO] chat-stream ttft={ttft_texto}ms total={total_ms:.0f}ms")
+
+    return Response(
+        stream_with_context(generar()),
+        mimetype="text/event-stream" if sse else "text/plain",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@bp.route("/chat-stream/metrics", methods=["GET"])
+def chat_stream_metrics():
+    return jsonify(metricas.estadisticas()), 200
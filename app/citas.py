@@ -1,20 +1,16 @@
 from app._____whatsapp import enviar_whatsapp
 from flask import jsonify, Blueprint
 import os
-from openai import OpenAI
 import json
-client_openai = OpenAI()
+from app.intent_engine import clasificar
+from app.http_clients import get_llm_client, get_http_session
+from app.availability import calcular_disponibilidad
 
 bp = Blueprint('citas', __name__)
 
 def detectar_intencion_cita(mensaje: str) -> bool:
-    palabras_clave = [
-        "cita", "agendar", "reservar", "consultar", "horario", 
-        "disponibilidad", "odontólogo", "dentista", "limpieza",
-        "extracción", "blanqueamiento", "ortodoncia", "consulta"
-    ]
-    mensaje_lower = mensaje.lower()
-    return any(palabra in mensaje_lower for palabra in palabras_clave)
+    """Indica si el mensaje trata sobre citas (agendar, cancelar o reprogramar)"""
+    return clasificar(mensaje).intencion != "consulta_general"
 
 
 def manejar_solicitud_cita(from_number: str, mensaje: str, usuario):
@@ -68,7 +64,7 @@ def extraer_info_cita(mensaje: str, usuario):
     """
     
     try:
-        response = client_openai.chat.completions.create(
+        response = get_llm_client("openai").chat.completions.create(
             model=os.getenv('MODEL_NAME'),
             messages=[
                 {"role": "system", "content": "Eres un asistente que extrae información estructurada de solicitudes de citas dentales."},
@@ -82,45 +78,8 @@ def extraer_info_cita(mensaje: str, usuario):
     
 
 def obtener_disponibilidad(dias=7):
-    """Obtiene horarios disponibles para los próximos días"""
-    from datetime import datetime, timedelta
-    
-    disponibilidad = []
-    hoy = datetime.now().date()
-    
-    for i in range(dias):
-        fecha = hoy + timedelta(days=i)
-        # Aquí integrarías con Calendly o generarías horarios estándar
-        if fecha.weekday() < 5:  # Lunes a Viernes
-            horarios = ["09:00:00", "10:00:00", "11:00:00", "15:00:00", "16:00:00", "17:00:00"]
-        else:  # Sábado
-            horarios = ["09:00:00", "10:00:00", "11:00:00"]
-        
-        # Filtrar horarios ya ocupados
-        horarios_disponibles = filtrar_horarios_ocupados(fecha, horarios)
-        
-        if horarios_disponibles:
-            disponibilidad.append({
-                "fecha": fecha.strftime("%Y-%m-%d"),
-                "dia_semana": fecha.strftime("%A"),
-                "horarios": horarios_disponibles
-            })
-    
-    return disponibilidad
-
-def filtrar_horarios_ocupados(fecha, horarios):
-    """Filtra horarios ya ocupados en la base de datos"""
-    from app.models import Appointment
-    from datetime import time
-    
-    citas_ocupadas = Appointment.query.filter_by(
-        date=fecha
-    ).filter(
-        Appointment.status.in_(['pending', 'confirmed'])
-    ).all()
-    
-    horarios_ocupados = [cita.time.strftime("%H:%M:%S") for cita in citas_ocupadas]
-    return [h for h in horarios if h not in horarios_ocupados]
+    """Obtiene horarios disponibles para los próximos días (una consulta para toda la ventana)"""
+    return calcular_disponibilidad(dias=dias)
 
 def format_disponibilidad(disponibilidad):
     """Formatea la disponibilidad para enviar por WhatsApp"""
@@ -132,8 +91,6 @@ def format_disponibilidad(disponibilidad):
 
 def crear_cita_via_api(info_cita):
     """Usa tu endpoint existente de appointments para crear la cita"""
-    import requests
-    
     data = {
         "name": info_cita.get("nombre", "Cliente WhatsApp"),
         "phone": info_cita.get("telefono"),
@@ -143,7 +100,7 @@ def crear_cita_via_api(info_cita):
     }
     
     # Llama a tu propio endpoint
-    response = requests.post(
+    response = get_http_session("interno").post(
         "http://localhost:5000/appointments/appointments",  # Ajusta la URL
         json=data
     )
@@ -0,0 +1,79 @@
+# app/coalescer.py
+import os
+import threading
+import time
+from flask import current_app, has_app_context
+from dotenv import load_dotenv
+from app.worker_pool import worker_pool
+
+load_dotenv()
+
+# Ventana de agrupación por remitente; 0 desactiva el agrupamiento
+WHATSAPP_DEBOUNCE_MS = int(os.getenv("WHATSAPP_DEBOUNCE_MS", "0"))
+# Espera máxima desde el primer mensaje, para que una ráfaga larga no se retrase sin límite
+WHATSAPP_DEBOUNCE_MAX_MS = int(os.getenv("WHATSAPP_DEBOUNCE_MAX_MS", str(WHATSAPP_DEBOUNCE_MS * 3)))
+
+
+class MessageCoalescer:
+    """
+    Agrupa los mensajes de un mismo número que llegan dentro de la ventana
+    y los entrega como un único turno a `procesar(from_number, texto, message_sids)`.
+    """
+
+    def __init__(self, procesar, ventana_ms=WHATSAPP_DEBOUNCE_MS, max_espera_ms=WHATSAPP_DEBOUNCE_MAX_MS):
+        self.procesar = procesar
+        self.ventana = ventana_ms / 1000
+        self.max_espera = max(max_espera_ms, ventana_ms) / 1000
+        self._pendientes = {}  # from_number -> dict(mensajes, sids, inicio, timer, app)
+        self._lock = threading.Lock()
+        self.mensajes_recibidos = 0
+        self.turnos_emitidos = 0
+
+    @property
+    def activo(self):
+        return self.ventana > 0
+
+    def agregar(self, from_number, body, message_sid=None):
+        app = current_app._get_current_object() if has_app_context() else None
+        with self._lock:
+            self.mensajes_recibidos += 1
+            pendiente = self._pendientes.get(from_number)
+            if pendiente is None:
+                pendiente = {"mensajes": [], "sids": [], "inicio": time.monotonic(), "timer": None, "app": app}
+                self._pendientes[from_number] = pendiente
+            pendiente["mensajes"].append(body)
+            if message_sid:
+                pendiente["sids"].append(message_sid)
+
+            # Reiniciar la ventana sin pasar de la espera máxima
+            if pendiente["timer"] is not None:
+                pendiente["timer"].cancel()
+            transcurrido = time.monotonic() - pendiente["inicio"]
+            espera = max(0, min(self.ventana, self.max_espera - transcurrido))
+            timer = threading.Timer(espera, self._vaciar, args=(from_number,))
+            timer.daemon = True
+            pendiente["timer"] = timer
+            timer.start()
+
+    def _vaciar(self, from_number):
+        with self._lock:
+            pendiente = self._pendientes.pop(from_number, None)
+        if pendiente is None:
+            return
+        self.turnos_emitidos += 1
+        texto = "\n".join(pendiente["mensajes"])
+        app = pendiente["app"]
+        if app is not None:
+            with app.app_context():
+                self._despachar(from_number, texto, pendiente["sids"])
+        else:
+            self._despachar(from_number, texto, pendiente["sids"])
+
+    def _despachar(self, from_number, texto, sids):
+        if worker_pool.submit(self.procesar, from_number, texto, sids):
+            return
+        # Los mensajes ya fueron confirmados a Twilio: si el pool está lleno se procesan aquí
+        try:
+            self.procesar(from_number, texto, sids)
+        except Exception as e:
+            print(f"[ERROR] coalescer {from_number}: {e}")
@@ -0,0 +1,162 @@
+# app/dedupe.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from app.state_store import iniciar_sweeper
+
+load_dotenv()
+
+# Backend de deduplicación de webhooks: memory | sql
+DEDUPE_BACKEND = os.getenv("DEDUPE_BACKEND", "memory")
+DEDUPE_TTL_SECONDS = int(os.getenv("DEDUPE_TTL_SECONDS", "3600"))
+DEDUPE_MAX_ENTRIES = int(os.getenv("DEDUPE_MAX_ENTRIES", "50000"))
+
+# Resultado que se devuelve mientras el primer intento sigue en curso
+EN_PROCESO = {"status": "processing"}
+
+
+class MemoryDedupe:
+    """
+    Registro en memoria de MessageSid ya recibidos, acotado por TTL y tamaño.
+    """
+
+    def __init__(self, ttl=DEDUPE_TTL_SECONDS, max_entradas=DEDUPE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._vistos = OrderedDict()  # sid -> (expira_en, resultado o None)
+        self._mutex = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def reclamar(self, sid):
+        """
+        Registra el sid si es nuevo. Retorna (es_nuevo, resultado_previo).
+        """
+        ahora = time.monotonic()
+        with self._mutex:
+            entrada = self._vistos.get(sid)
+            if entrada is not None and entrada[0] >= ahora:
+                self.hits += 1
+                return False, entrada[1] or EN_PROCESO
+            self.misses += 1
+            self._vistos[sid] = (ahora + self.ttl, None)
+            self._vistos.move_to_end(sid)
+            while len(self._vistos) > self.max_entradas:
+                self._vistos.popitem(last=False)
+            return True, None
+
+    def completar(self, sid, resultado):
+        with self._mutex:
+            if sid in self._vistos:
+                self._vistos[sid] = (self._vistos[sid][0], resultado)
+
+    def liberar(self, sid):
+        """
+        Olvida el sid para que un reintento de Twilio se procese de nuevo.
+        """
+        with self._mutex:
+            self._vistos.pop(sid, None)
+
+    def sweep(self) -> int:
+        ahora = time.monotonic()
+        with self._mutex:
+            vencidos = [k for k, (expira_en, _) in self._vistos.items() if expira_en < ahora]
+            for k in vencidos:
+                del self._vistos[k]
+        return len(vencidos)
+
+    def estadisticas(self):
+        return {"hits": self.hits, "misses": self.misses, "entradas": len(self._vistos)}
+
+
+class SQLDedupe:
+    """
+    Registro de MessageSid en la tabla processed_messages, compartido entre workers.
+    La clave primaria garantiza que solo un worker reclame cada mensaje.
+    """
+
+    def __init__(self, ttl=DEDUPE_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _limite(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+
+    def reclamar(self, sid):
+        from app import db
+        from app.models import ProcessedMessage
+        from sqlalchemy.exc import IntegrityError
+
+        # Un registro vencido no cuenta como duplicado
+        ProcessedMessage.query.filter(
+            ProcessedMessage.message_sid == sid,
+            ProcessedMessage.created_at < self._limite()
+        ).delete(synchronize_session=False)
+        db.session.add(ProcessedMessage(message_sid=sid, created_at=datetime.now(timezone.utc)))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            fila = db.session.get(ProcessedMessage, sid)
+            self.hits += 1
+            if fila is None or not fila.resultado:
+                return False, EN_PROCESO
+            return False, json.loads(fila.resultado)
+        self.misses += 1
+        return True, None
+
+    def completar(self, sid, resultado):
+        from app import db
+        from app.models import ProcessedMessage
+
+        ProcessedMessage.query.filter_by(message_sid=sid).update(
+            {"resultado": json.dumps(resultado)}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def liberar(self, sid):
+        from app import db
+        from app.models import ProcessedMessage
+
+        ProcessedMessage.query.filter_by(message_sid=sid).delete(synchronize_session=False)
+        db.session.commit()
+
+    def sweep(self) -> int:
+        from app import db
+        from app.models import ProcessedMessage
+
+        borrados = ProcessedMessage.query.filter(
+            ProcessedMessage.created_at < self._limite()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return borrados
+
+    def estadisticas(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_dedupe = None
+_dedupe_lock = threading.Lock()
+
+
+def get_dedupe():
+    """
+    Retorna el deduplicador configurado en DEDUPE_BACKEND, creándolo en el primer uso.
+    """
+    global _dedupe
+    if _dedupe is not None:
+        return _dedupe
+    with _dedupe_lock:
+        if _dedupe is None:
+            from flask import current_app, has_app_context
+
+            dedupe = SQLDedupe() if DEDUPE_BACKEND == "sql" else MemoryDedupe()
+            app = current_app._get_current_object() if has_app_context() else None
+            iniciar_sweeper(dedupe, app, nombre="dedupe-sweeper")
+            _dedupe = dedupe
+    return _dedupe
@@ -0,0 +1,215 @@
+# app/embeddings.py
+import array
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from app.intent_engine import normalizar
+
+load_dotenv()
+
+# Backend de embeddings: onnx | hashing | sentence_transformers
+#   onnx: MiniLM-L6-v2 local de Chroma (el mismo que usa Chroma por defecto)
+#   hashing: sin modelo ni red, para hosts sin conexión
+#   sentence_transformers: cualquier modelo local de sentence-transformers (EMBEDDING_MODEL)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Archivo SQLite de la caché de embeddings; vacío la desactiva
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "chroma_db/embeddings_cache.sqlite")
+
+
+class HashingEmbedder:
+    """
+    Embeddings por hashing de palabras, bigramas y trigramas de caracteres,
+    con tf sublineal y norma L2. No necesita modelo ni red.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self.nombre = f"hashing-{dim}"
+
+    def _rasgos(self, texto):
+        palabras = normalizar(texto).split()
+        rasgos = list(palabras)
+        rasgos += [f"{a} {b}" for a, b in zip(palabras, palabras[1:])]
+        for palabra in palabras:
+            marcada = f"<{palabra}>"
+            rasgos += [f"#{marcada[i:i + 3]}" for i in range(len(marcada) - 2)]
+        return rasgos
+
+    def _vector(self, texto):
+        conteos = {}
+        for rasgo in self._rasgos(texto):
+            h = int.from_bytes(hashlib.blake2b(rasgo.encode("utf-8"), digest_size=8).digest(), "little")
+            indice, signo = h % self.dim, 1.0 if (h >> 63) else -1.0
+            conteos[indice] = conteos.get(indice, 0.0) + signo
+        vector = [0.0] * self.dim
+        for indice, valor in conteos.items():
+            vector[indice] = math.copysign(1 + math.log(abs(valor)), valor) if valor else 0.0
+        norma = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norma for v in vector]
+
+    def embeber(self, textos):
+        return [self._vector(t) for t in textos]
+
+
+class OnnxEmbedder:
+    """
+    MiniLM-L6-v2 en ONNX, incluido con Chroma. Descarga el modelo una vez y luego corre local.
+    """
+
+    nombre = "onnx-minilm-l6-v2"
+
+    def __init__(self):
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+        self._fn = ONNXMiniLM_L6_V2()
+
+    def embeber(self, textos):
+        return [list(map(float, v)) for v in self._fn(list(textos))]
+
+
+class SentenceTransformerEmbedder:
+    """
+    Modelo de sentence-transformers (nombre o ruta local en EMBEDDING_MODEL).
+    """
+
+    def __init__(self, modelo=EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self._modelo = SentenceTransformer(modelo)
+        self.nombre = f"st-{os.path.basename(modelo.rstrip('/'))}"
+
+    def embeber(self, textos):
+        return self._modelo.encode(list(textos), normalize_embeddings=True).tolist()
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings en SQLite, direccionada por contenido:
+    la clave es el hash del backend más el texto.
+    """
+
+    def __init__(self, ruta=EMBEDDING_CACHE_PATH):
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (clave TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(backend, texto):
+        return hashlib.sha256(f"{backend}\0{texto}".encode("utf-8")).hexdigest()
+
+    def get_muchos(self, claves):
+        resultado = {}
+        with self._lock:
+            # Por tramos para no pasar el límite de parámetros de SQLite
+            for i in range(0, len(claves), 500):
+                tramo = claves[i:i + 500]
+                filas = self._conn.execute(
+                    f"SELECT clave, vector FROM embeddings WHERE clave IN ({','.join('?' * len(tramo))})", tramo
+                )
+                for clave, blob in filas:
+                    resultado[clave] = array.array("f", blob).tolist()
+        return resultado
+
+    def set_muchos(self, pares):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (clave, vector) VALUES (?, ?)",
+                [(clave, array.array("f", vector).tobytes()) for clave, vector in pares]
+            )
+            self._conn.commit()
+
+
+class CachedEmbedder:
+    """
+    Envuelve un backend: busca cada texto en la caché y embebe los faltantes en lotes.
+    """
+
+    def __init__(self, backend, cache=None, lote=EMBEDDING_BATCH_SIZE):
+        self.backend = backend
+        self.nombre = backend.nombre
+        self.cache = cache
+        self.lote = lote
+        self.hits = 0
+        self.misses = 0
+
+    def embeber(self, textos):
+        textos = list(textos)
+        if not textos:
+            return []
+        claves = [EmbeddingCache.clave(self.nombre, t) for t in textos]
+        encontrados = self.cache.get_muchos(list(set(claves))) if self.cache else {}
+
+        faltantes = {}  # clave -> texto, sin repetidos
+        for clave, texto in zip(claves, textos):
+            if clave not in encontrados:
+                faltantes.setdefault(clave, texto)
+        self.hits += len(textos) - len(faltantes)
+        self.misses += len(faltantes)
+
+        pendientes = list(faltantes.items())
+        for i in range(0, len(pendientes), self.lote):
+            tramo = pendientes[i:i + self.lote]
+            vectores = self.backend.embeber([t for _, t in tramo])
+            nuevos = [(clave, vector) for (clave, _), vector in zip(tramo, vectores)]
+            encontrados.update(nuevos)
+            if self.cache:
+                self.cache.set_muchos(nuevos)
+        return [encontrados[c] for c in claves]
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            "backend": self.nombre,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def nombre_coleccion(base: str) -> str:
+    """
+    Nombre de colección para el backend activo. Con onnx se mantiene el nombre original,
+    porque sus vectores coinciden con los que Chroma generaba por defecto.
+    """
+    embedder = get_embedder()
+    return base if embedder.nombre == OnnxEmbedder.nombre else f"{base}_{embedder.nombre}"
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> CachedEmbedder:
+    """
+    Retorna el embedder de EMBEDDING_BACKEND con su caché, creándolo en el primer uso.
+    """
+    global _embedder
+    if _embedder is not None:
+        return _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            if EMBEDDING_BACKEND == "hashing":
+                backend = HashingEmbedder()
+            elif EMBEDDING_BACKEND == "sentence_transformers":
+                backend = SentenceTransformerEmbedder()
+            else:
+                backend = OnnxEmbedder()
+            cache = EmbeddingCache() if EMBEDDING_CACHE_PATH else None
+            _embedder = CachedEmbedder(backend, cache)
+    return _embedder
+
+
+def estadisticas():
+    # No crea el embedder: /metrics no debe cargar el modelo
+    return _embedder.estadisticas() if _embedder is not None else None
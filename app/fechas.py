@@ -0,0 +1,177 @@
+# app/fechas.py
+import re
+import unicodedata
+from datetime import date, timedelta
+
+# Parser local de fechas y horas en español. Devuelve None cuando no entiende
+# el texto, para que quien llama decida si recurrir al LLM.
+
+_DIAS_SEMANA = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "domingo": 6,
+}
+_MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+}
+_NUMEROS = {
+    "una": 1, "uno": 1, "un": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6,
+    "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11, "doce": 12,
+}
+
+_RE_ISO = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_RE_DIA_MES = re.compile(
+    r"\b(\d{1,2})\s+(?:de\s+)?(" + "|".join(_MESES) + r")\b(?:\s+(?:de\s+|del\s+)?(\d{4}))?"
+)
+_RE_NUMERICA = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2}|\d{4}))?\b")
+_RE_PASADO_MANANA = re.compile(r"\bpasado\s+manana\b")
+_RE_MANANA = re.compile(r"(?<!la )\bmanana\b")
+_RE_HOY = re.compile(r"\bhoy\b")
+_RE_EN_DIAS = re.compile(
+    r"\b(?:en|dentro de)\s+(\d{1,2}|" + "|".join(_NUMEROS) + r")\s+(dia|dias|semana|semanas)\b"
+)
+_RE_DIA_SEMANA = re.compile(r"\b(" + "|".join(_DIAS_SEMANA) + r")\b")
+
+_RE_NUMERO_PALABRA = re.compile(r"\b(a las|las|a la|la)\s+(" + "|".join(_NUMEROS) + r")\b")
+_RE_MEDIODIA = re.compile(r"\bmedio\s?dia\b")
+# Un número sin ninguna marca de hora solo vale si es todo el mensaje ("3", "las 3")
+_RE_HORA_SUELTA = re.compile(r"^(?:a\s+)?(?:las?\s+)?\d{1,2}$")
+_RE_HORA = re.compile(
+    r"(\ba las\s+|\ba la\s+)?"
+    r"\b(\d{1,2})(?![\d/-])"
+    r"(?:\s*[:h.]\s*(\d{2})(?!\d))?"
+    r"(?:\s+y\s+(media|cuarto|\d{1,2})(?!\d))?"
+    r"(?:\s+menos\s+(cuarto|\d{1,2})(?!\d))?"
+    r"(?:\s*(a\.?\s?m\b\.?|p\.?\s?m\b\.?|hrs?\b|horas?\b|h\b))?"
+    r"(?:\s+(?:de|en|por)\s+la\s+(manana|tarde|noche|madrugada))?"
+)
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c)).strip()
+
+
+def _numero(valor: str) -> int:
+    return int(valor) if valor.isdigit() else _NUMEROS[valor]
+
+
+def _fecha_segura(anio, mes, dia):
+    try:
+        return date(anio, mes, dia)
+    except ValueError:
+        return None
+
+
+def parsear_fecha(texto: str, hoy: date = None):
+    """
+    Convierte referencias como "hoy", "pasado mañana", "el lunes", "15 de diciembre"
+    o "15/12" a YYYY-MM-DD. Las fechas sin año se asumen en el futuro.
+    Retorna None si no reconoce el texto.
+    """
+    if not texto:
+        return None
+    hoy = hoy or date.today()
+    t = _normalizar(texto)
+
+    m = _RE_ISO.search(t)
+    if m:
+        fecha = _fecha_segura(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        return fecha.isoformat() if fecha else None
+
+    m = _RE_DIA_MES.search(t)
+    if m:
+        dia, mes = int(m.group(1)), _MESES[m.group(2)]
+        return _con_anio(dia, mes, m.group(3), hoy)
+
+    m = _RE_NUMERICA.search(t)
+    if m:
+        return _con_anio(int(m.group(1)), int(m.group(2)), m.group(3), hoy)
+
+    if _RE_PASADO_MANANA.search(t):
+        return (hoy + timedelta(days=2)).isoformat()
+    if _RE_MANANA.search(t):
+        return (hoy + timedelta(days=1)).isoformat()
+    if _RE_HOY.search(t):
+        return hoy.isoformat()
+
+    m = _RE_EN_DIAS.search(t)
+    if m:
+        cantidad = _numero(m.group(1))
+        dias = cantidad * 7 if m.group(2).startswith("semana") else cantidad
+        return (hoy + timedelta(days=dias)).isoformat()
+
+    m = _RE_DIA_SEMANA.search(t)
+    if m:
+        # Siempre el próximo: "el lunes" dicho un lunes es dentro de una semana
+        delta = (_DIAS_SEMANA[m.group(1)] - hoy.weekday()) % 7 or 7
+        return (hoy + timedelta(days=delta)).isoformat()
+
+    return None
+
+
+def _con_anio(dia, mes, anio_texto, hoy):
+    if anio_texto:
+        anio = int(anio_texto)
+        anio = anio + 2000 if anio < 100 else anio
+        fecha = _fecha_segura(anio, mes, dia)
+    else:
+        fecha = _fecha_segura(hoy.year, mes, dia)
+        if fecha and fecha < hoy:
+            fecha = _fecha_segura(hoy.year + 1, mes, dia)
+    return fecha.isoformat() if fecha else None
+
+
+def parsear_hora(texto: str):
+    """
+    Convierte horas como "3pm", "15:00", "10 de la mañana", "3 y media",
+    "a las 10 y cuarto" o "4 menos cuarto" a HH:MM (24h).
+    Sin am/pm ni "de la mañana", las horas 1 a 7 se interpretan por la tarde
+    ("las 3", "3 y media", "a las 3"), por el horario de la clínica.
+    Retorna None si no reconoce el texto.
+    """
+    if not texto:
+        return None
+    t = _normalizar(texto)
+    if _RE_MEDIODIA.search(t):
+        return "12:00"
+    t = _RE_NUMERO_PALABRA.sub(lambda m: f"{m.group(1)} {_NUMEROS[m.group(2)]}", t)
+
+    candidatos = list(_RE_HORA.finditer(t))
+    if not candidatos:
+        return None
+    # Preferir la coincidencia con alguna marca de hora; si no hay, solo vale un número solo
+    con_marca = [m for m in candidatos if any(m.group(i) for i in (1, 3, 4, 5, 6, 7))]
+    if con_marca:
+        m = con_marca[0]
+    elif _RE_HORA_SUELTA.match(t):
+        m = candidatos[0]
+    else:
+        return None
+
+    hora = int(m.group(2))
+    # Una hora suelta de 1 a 7 sin am/pm se toma por la tarde; "07:00" con cero explícito no
+    tarde_implicita = 1 <= hora <= 7 and not m.group(2).startswith("0")
+    minutos = int(m.group(3)) if m.group(3) else 0
+    if m.group(4):
+        minutos = {"media": 30, "cuarto": 15}.get(m.group(4)) or int(m.group(4))
+    if m.group(5):
+        hora -= 1
+        minutos = 60 - ({"cuarto": 15}.get(m.group(5)) or int(m.group(5)))
+
+    sufijo = (m.group(6) or "").replace(".", "").replace(" ", "")
+    periodo = m.group(7)
+    if sufijo == "pm" or periodo in ("tarde", "noche"):
+        if hora < 12:
+            hora += 12
+    elif sufijo == "am" or periodo in ("manana", "madrugada"):
+        if hora == 12:
+            hora = 0
+    elif tarde_implicita:
+        hora += 12
+
+    if not (0 <= hora < 24 and 0 <= minutos < 60):
+        return None
+    return f"{hora:02d}:{minutos:02d}"
+
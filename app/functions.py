@@ -1,17 +1,85 @@
 from flask import Blueprint, jsonify
 import tiktoken
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
 
 load_dotenv()
 MODEL=os.getenv("MODEL_NAME", "gpt-5-nano")  # Modelo por defecto si no está en .env
+# Máximo de tokens de documentos recuperados que se incluyen en el prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
 
 bp = Blueprint('functions', __name__)
 
 
+@lru_cache(maxsize=16)
+def get_encoding(model_name: str = MODEL):
+    """Encoder de tiktoken por modelo, creado una sola vez"""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # Modelos que tiktoken no conoce (p. ej. grok-3): codificación genérica
+        return tiktoken.get_encoding("cl100k_base")
+
+
 def count_tokens_model(text: str, model_name: str = MODEL) -> int:
-    encoding = tiktoken.encoding_for_model(model_name)
-    return len(encoding.encode(text))
+    return len(get_encoding(model_name).encode(text))
+
+
+def count_tokens_batch(texts, model_name: str = MODEL) -> list:
+    """Cuenta los tokens de varios textos en una sola llamada"""
+    return [len(tokens) for tokens in get_encoding(model_name).encode_batch(list(texts))]
+
+
+def recortar_contexto(docs, presupuesto: int = CONTEXT_TOKEN_BUDGET, model_name: str = MODEL) -> list:
+    """
+    Conserva los documentos, en orden de relevancia, mientras quepan en el presupuesto
+    de tokens; se descartan primero los de menor ranking. Si el primero no cabe
+    completo, se trunca.
+    """
+    if not docs:
+        return []
+    seleccion = []
+    usados = 0
+    for doc, n_tokens in zip(docs, count_tokens_batch(docs, model_name)):
+        if usados + n_tokens > presupuesto:
+            if not seleccion:
+                encoding = get_encoding(model_name)
+                seleccion.append(encoding.decode(encoding.encode(doc)[:presupuesto]))
+            break
+        seleccion.append(doc)
+        usados += n_tokens
+    return seleccion
+
+@bp.route('/metrics', methods=['GET'])
+def metricas():
+    """Contadores de los componentes que evitan trabajo por turno"""
+    from app.intent_engine import estadisticas as estadisticas_intenciones
+    from app.dedupe import get_dedupe
+    from app.worker_pool import worker_pool
+    from app.answer_cache import get_answer_cache
+    from app.semantic_cache import estadisticas as estadisticas_semantica
+    from app.outbound import dispatcher
+    from app.embeddings import estadisticas as estadisticas_embeddings
+    from app.retrieval import estadisticas as estadisticas_recuperacion
+    from app.availability import estadisticas as estadisticas_disponibilidad
+
+    return jsonify({
+        "intenciones": estadisticas_intenciones(),
+        "dedupe": get_dedupe().estadisticas(),
+        "cache_respuestas": get_answer_cache().estadisticas(),
+        "cache_semantica": estadisticas_semantica(),
+        "outbound": dispatcher.estadisticas(),
+        "embeddings": estadisticas_embeddings(),
+        "recuperacion": estadisticas_recuperacion(),
+        "disponibilidad": estadisticas_disponibilidad(),
+        "worker_pool": {
+            "pendientes": worker_pool.pendientes(),
+            "procesadas": worker_pool.procesadas,
+            "rechazadas": worker_pool.rechazadas,
+            "fallidas": worker_pool.fallidas
+        }
+    }), 200
 
 # Manejo global de errores (opcional pero recomendable)
 @bp.errorhandler(500)
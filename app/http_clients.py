@@ -0,0 +1,142 @@
+# app/http_clients.py
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Clientes HTTP compartidos: un pool de conexiones keep-alive por servicio,
+# con timeouts y reintentos con backoff exponencial y jitter.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.3"))
+
+# Timeouts en segundos por servicio
+TIMEOUTS = {
+    "xai": float(os.getenv("XAI_TIMEOUT", "30")),
+    "openai": float(os.getenv("OPENAI_TIMEOUT", "30")),
+    "twilio": float(os.getenv("TWILIO_TIMEOUT", "10")),
+    "calendly": float(os.getenv("CALENDLY_TIMEOUT", "10")),
+    "interno": float(os.getenv("INTERNAL_API_TIMEOUT", "10")),
+}
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+class RetryConJitter(Retry):
+    """
+    Retry de urllib3 que suma un jitter aleatorio al backoff exponencial,
+    para que los reintentos de varios workers no lleguen todos juntos.
+    """
+
+    def get_backoff_time(self):
+        espera = super().get_backoff_time()
+        return espera + random.uniform(0, HTTP_BACKOFF_JITTER) if espera else espera
+
+
+class SesionConTimeout(requests.Session):
+    """
+    Session que aplica un timeout por defecto a cada petición.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _politica_reintentos():
+    # POST no se reintenta por estado HTTP (no es idempotente); sí ante fallos de conexión
+    return RetryConJitter(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+    )
+
+
+def _montar_pool(sesion):
+    adaptador = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=_politica_reintentos()
+    )
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+def _compartido(clave, crear):
+    cliente = _clientes.get(clave)
+    if cliente is not None:
+        return cliente
+    with _clientes_lock:
+        if clave not in _clientes:
+            _clientes[clave] = crear()
+    return _clientes[clave]
+
+
+def get_http_session(servicio: str) -> requests.Session:
+    """
+    Session de requests compartida para un servicio (calendly, interno, ...).
+    """
+    return _compartido(
+        f"http:{servicio}",
+        lambda: _montar_pool(SesionConTimeout(TIMEOUTS.get(servicio, 10)))
+    )
+
+
+def get_llm_client(proveedor: str = "xai"):
+    """
+    Cliente OpenAI compartido. `proveedor` es "xai" (API compatible de x.ai) u "openai".
+    El SDK ya reintenta con backoff exponencial y jitter; aquí se fija el pool y el timeout.
+    """
+    def crear():
+        from openai import OpenAI, DefaultHttpxClient
+        import httpx
+
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        )
+        opciones = {
+            "timeout": TIMEOUTS[proveedor],
+            "max_retries": HTTP_MAX_RETRIES,
+            "http_client": http_client,
+        }
+        if proveedor == "xai":
+            return OpenAI(api_key=os.getenv("XAI_API_KEY"), base_url="https://api.x.ai/v1", **opciones)
+        return OpenAI(**opciones)
+
+    return _compartido(f"llm:{proveedor}", crear)
+
+
+def get_twilio_client():
+    """
+    Cliente de Twilio compartido con pool de conexiones, timeout y reintentos.
+    """
+    def crear():
+        from twilio.rest import Client
+        from twilio.http.http_client import TwilioHttpClient
+
+        http_client = TwilioHttpClient(pool_connections=True, timeout=TIMEOUTS["twilio"])
+        _montar_pool(http_client.session)
+        return Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'), http_client=http_client)
+
+    return _compartido("twilio", crear)
+
+
+def clientes_iniciados():
+    """
+    Claves de los clientes ya creados (p. ej. "llm:xai", "twilio"), para /ready.
+    """
+    with _clientes_lock:
+        return sorted(_clientes)
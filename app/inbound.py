@@ -0,0 +1,128 @@
+# app/inbound.py
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from app import db
+from app.models import InboundMessage
+from app.worker_pool import worker_pool
+
+load_dotenv()
+
+# Un mensaje pendiente, en proceso o fallido sin novedades por más de esto se vuelve a entregar
+# (el proceso se reinició, el worker murió o el turno falló)
+INBOUND_REDELIVER_AFTER_SECONDS = int(os.getenv("INBOUND_REDELIVER_AFTER_SECONDS", "300"))
+# Entregas por mensaje; al llegar al máximo queda como fallido
+INBOUND_MAX_ATTEMPTS = int(os.getenv("INBOUND_MAX_ATTEMPTS", "3"))
+# Un mensaje más viejo que esto ya no se responde
+INBOUND_MAX_AGE_SECONDS = int(os.getenv("INBOUND_MAX_AGE_SECONDS", "3600"))
+# Cuánto se conservan los registros antes de borrarlos
+INBOUND_RETENTION_SECONDS = int(os.getenv("INBOUND_RETENTION_SECONDS", "86400"))
+INBOUND_SWEEP_SECONDS = int(os.getenv("INBOUND_SWEEP_SECONDS", "60"))
+
+
+def registrar_entrante(sid, from_number, body):
+    """
+    Guarda el mensaje como pendiente. Se llama antes de confirmarlo a Twilio,
+    que ya no lo reintentará.
+    """
+    ahora = datetime.now(timezone.utc)
+    db.session.merge(InboundMessage(
+        message_sid=sid,
+        from_number=from_number,
+        body=body,
+        status="pendiente",
+        intentos=0,
+        error=None,
+        created_at=ahora,
+        updated_at=ahora
+    ))
+    db.session.commit()
+
+
+def _actualizar(sids, **valores):
+    if not sids:
+        return
+    InboundMessage.query.filter(InboundMessage.message_sid.in_(sids)).update(
+        {**valores, "updated_at": datetime.now(timezone.utc)}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def marcar_procesando(sids):
+    # El intento se cuenta al empezar, así un mensaje que tumba el proceso no se reentrega sin fin
+    _actualizar(sids, status="procesando", intentos=InboundMessage.intentos + 1)
+
+
+def marcar_completados(sids):
+    _actualizar(sids, status="completado", error=None)
+
+
+def marcar_fallidos(sids, error):
+    _actualizar(sids, status="fallido", error=str(error))
+
+
+def descartar(sids):
+    """
+    Borra los mensajes que no se confirmaron a Twilio: su reintento los vuelve a traer.
+    """
+    if not sids:
+        return
+    InboundMessage.query.filter(InboundMessage.message_sid.in_(sids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def reentregar(procesar, limite=100) -> int:
+    """
+    Encola en el pool `procesar(from_number, body, [sid])` para los mensajes que no se
+    completaron. Con varios procesos, un UPDATE condicional decide quién retoma cada uno.
+    Retorna cuántos encoló.
+    """
+    ahora = datetime.now(timezone.utc)
+    filas = InboundMessage.query.filter(
+        InboundMessage.status.in_(("pendiente", "procesando", "fallido")),
+        InboundMessage.updated_at < ahora - timedelta(seconds=INBOUND_REDELIVER_AFTER_SECONDS),
+        InboundMessage.created_at >= ahora - timedelta(seconds=INBOUND_MAX_AGE_SECONDS),
+        InboundMessage.intentos < INBOUND_MAX_ATTEMPTS,
+    ).order_by(InboundMessage.created_at).limit(limite).all()
+
+    encolados = 0
+    for fila in filas:
+        tomado = InboundMessage.query.filter_by(message_sid=fila.message_sid, updated_at=fila.updated_at).update(
+            {"updated_at": ahora}, synchronize_session=False
+        )
+        db.session.commit()
+        if not tomado:
+            continue
+        if not worker_pool.submit(procesar, fila.from_number, fila.body, [fila.message_sid]):
+            break  # pool lleno: el resto queda para el próximo barrido
+        encolados += 1
+    return encolados
+
+
+def purgar() -> int:
+    limite = datetime.now(timezone.utc) - timedelta(seconds=INBOUND_RETENTION_SECONDS)
+    borrados = InboundMessage.query.filter(InboundMessage.created_at < limite).delete(synchronize_session=False)
+    db.session.commit()
+    return borrados
+
+
+def iniciar_reentrega(app, procesar, intervalo=INBOUND_SWEEP_SECONDS):
+    """
+    Lanza el hilo que, al arrancar y luego cada `intervalo` segundos, reentrega
+    los mensajes sin completar y borra los registros vencidos.
+    """
+    def ciclo():
+        while True:
+            try:
+                with app.app_context():
+                    encolados = reentregar(procesar)
+                    borrados = purgar()
+                if encolados or borrados:
+                    print(f"[INFO] inbound: {encolados} mensajes reentregados, {borrados} registros eliminados")
+            except Exception as e:
+                print(f"[ERROR] inbound: {e}")
+            time.sleep(intervalo)
+
+    threading.Thread(target=ciclo, name="inbound-redelivery", daemon=True).start()
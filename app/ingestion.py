@@ -0,0 +1,208 @@
+# app/ingestion.py
+"""
+Carga masiva de documentos a la colección vectorial.
+
+Uso: python -m app.ingestion <directorio> [--tamano 800] [--solapamiento 100] [--lote 64] [--podar]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from app.my_collections import get_coleccion, hash_contenido, podar_documentos, sincronizar_documentos
+from app.lexical import invalidar_indices
+
+load_dotenv()
+
+# Tamaño de fragmento y solapamiento en caracteres
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "800"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "100"))
+# Fragmentos que se embeben por llamada a la colección
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+EXTENSIONES = (".md", ".markdown", ".txt", ".csv")
+# Columnas de un CSV que se usan como texto; si no hay ninguna, se usan todas
+_COLUMNAS_TEXTO = ("texto", "text", "contenido", "content", "documento")
+
+
+def iterar_archivos(directorio):
+    """
+    Recorre el directorio (recursivo) en orden estable y entrega las rutas soportadas.
+    """
+    for raiz, carpetas, archivos in os.walk(directorio):
+        carpetas.sort()
+        for nombre in sorted(archivos):
+            if nombre.lower().endswith(EXTENSIONES):
+                yield os.path.join(raiz, nombre)
+
+
+def leer_documentos(ruta):
+    """
+    Entrega (sufijo, texto) por documento: uno por archivo de texto o Markdown,
+    uno por fila en un CSV. Los CSV se leen fila a fila.
+    """
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, encoding="utf-8", newline="") as f:
+            lector = csv.DictReader(f)
+            columnas = [c for c in (lector.fieldnames or []) if c.strip().lower() in _COLUMNAS_TEXTO]
+            for n, fila in enumerate(lector):
+                if columnas:
+                    texto = "\n".join(fila[c] for c in columnas if fila.get(c))
+                else:
+                    texto = "\n".join(f"{k}: {v}" for k, v in fila.items() if k and v)
+                yield f"fila{n}", texto
+    else:
+        with open(ruta, encoding="utf-8") as f:
+            yield "", f.read()
+
+
+def dividir_en_fragmentos(texto, tamano=INGEST_CHUNK_SIZE, solapamiento=INGEST_CHUNK_OVERLAP):
+    """
+    Divide el texto en fragmentos de hasta `tamano` caracteres que se solapan
+    `solapamiento` caracteres. Corta preferentemente en párrafos o espacios.
+    """
+    if solapamiento >= tamano:
+        raise ValueError("El solapamiento debe ser menor que el tamaño del fragmento")
+    texto = texto.strip()
+    inicio = 0
+    while inicio < len(texto):
+        fin = min(inicio + tamano, len(texto))
+        if fin < len(texto):
+            corte = texto.rfind("\n\n", inicio + solapamiento + 1, fin)
+            if corte == -1:
+                corte = texto.rfind(" ", inicio + solapamiento + 1, fin)
+            if corte != -1:
+                fin = corte
+        fragmento = texto[inicio:fin].strip()
+        if fragmento:
+            yield fragmento
+        if fin >= len(texto):
+            break
+        inicio = max(fin - solapamiento, inicio + 1)
+
+
+def fragmentos_de_archivo(ruta, directorio, tamano=INGEST_CHUNK_SIZE, solapamiento=INGEST_CHUNK_OVERLAP):
+    """
+    Entrega (id, texto, metadata) por fragmento de un archivo del directorio.
+    """
+    relativa = os.path.relpath(ruta, directorio).replace(os.sep, "/")
+    for sufijo, texto in leer_documentos(ruta):
+        base = f"{relativa}:{sufijo}" if sufijo else relativa
+        for n, fragmento in enumerate(dividir_en_fragmentos(texto, tamano, solapamiento)):
+            yield f"{base}#{n}", fragmento, {"fuente": relativa}
+
+
+def iterar_fragmentos(directorio, tamano=INGEST_CHUNK_SIZE, solapamiento=INGEST_CHUNK_OVERLAP):
+    """
+    Entrega (id, texto, metadata) por fragmento. El id depende de la ruta relativa
+    y la posición, así que volver a ingerir el mismo árbol actualiza en lugar de duplicar.
+    """
+    for ruta in iterar_archivos(directorio):
+        yield from fragmentos_de_archivo(ruta, directorio, tamano, solapamiento)
+
+
+def podar_fuentes(coleccion, vigentes_por_fuente, pagina=500):
+    """
+    Borra los fragmentos de cada fuente cuyo id no está entre sus vigentes (el archivo
+    se achicó o cambió su fragmentación). Consulta de a `pagina` fuentes por vez.
+    Retorna cuántos se borraron.
+    """
+    fuentes = sorted(vigentes_por_fuente)
+    # Los ids llevan la ruta de la fuente, así que no se repiten entre fuentes
+    vigentes = set().union(*vigentes_por_fuente.values())
+    borrados = 0
+    for desde in range(0, len(fuentes), pagina):
+        borrados += podar_documentos(coleccion, {"fuente": {"$in": fuentes[desde:desde + pagina]}}, vigentes)
+    return borrados
+
+
+def podar_fuentes_inexistentes(coleccion, fuentes, pagina=5000):
+    """
+    Borra los fragmentos cuya fuente no está en `fuentes` (archivos eliminados del directorio).
+    Los documentos sin metadata "fuente" no se tocan. Retorna cuántos se borraron.
+    """
+    sobrantes = []
+    for desde in range(0, coleccion.count(), pagina):
+        lote = coleccion.get(include=["metadatas"], limit=pagina, offset=desde)
+        sobrantes += [
+            i for i, m in zip(lote["ids"], lote["metadatas"])
+            if m and m.get("fuente") is not None and m["fuente"] not in fuentes
+        ]
+    # Se borra al final para no correr el offset de la paginación
+    for desde in range(0, len(sobrantes), pagina):
+        coleccion.delete(ids=sobrantes[desde:desde + pagina])
+    if sobrantes:
+        invalidar_indices()
+    return len(sobrantes)
+
+
+def ingerir_directorio(directorio, coleccion=None, tamano=INGEST_CHUNK_SIZE,
+                       solapamiento=INGEST_CHUNK_OVERLAP, lote=INGEST_BATCH_SIZE, podar=False, progreso=print):
+    """
+    Ingiere todos los documentos del directorio en lotes de `lote` fragmentos.
+    Los fragmentos con contenido repetido se omiten y solo se embeben los nuevos o modificados.
+    Al terminar se borran los fragmentos que ya no existen de cada archivo. Con `podar`,
+    también los de archivos que ya no están en el directorio; es opcional porque
+    varios directorios pueden compartir la colección.
+    Retorna un dict con los totales.
+    """
+    coleccion = coleccion if coleccion is not None else get_coleccion()
+    totales = {"fragmentos": 0, "duplicados": 0, "embebidos": 0, "sin_cambios": 0, "borrados": 0}
+    vistos = set()  # hashes ya ingeridos en esta corrida
+    vigentes = {}  # fuente -> ids que quedan en la colección
+    pendiente = []
+    inicio = time.perf_counter()
+
+    def vaciar():
+        ids, textos, metadatas = zip(*pendiente)
+        embebidos = sincronizar_documentos(coleccion, list(textos), list(ids), list(metadatas))
+        totales["embebidos"] += embebidos
+        totales["sin_cambios"] += len(pendiente) - embebidos
+        pendiente.clear()
+        if progreso:
+            progreso(
+                f"[INFO] {totales['fragmentos']} fragmentos procesados, {totales['embebidos']} embebidos, "
+                f"{totales['duplicados']} duplicados ({time.perf_counter() - inicio:.1f} s)"
+            )
+
+    for ruta in iterar_archivos(directorio):
+        fuente = os.path.relpath(ruta, directorio).replace(os.sep, "/")
+        vigentes_fuente = vigentes.setdefault(fuente, set())
+        for id_, texto, metadata in fragmentos_de_archivo(ruta, directorio, tamano, solapamiento):
+            totales["fragmentos"] += 1
+            huella = hash_contenido(texto)
+            if huella in vistos:
+                totales["duplicados"] += 1
+                continue
+            vistos.add(huella)
+            vigentes_fuente.add(id_)
+            pendiente.append((id_, texto, metadata))
+            if len(pendiente) >= lote:
+                vaciar()
+    # Los fragmentos vigentes tienen que estar escritos antes de podar
+    if pendiente:
+        vaciar()
+    totales["borrados"] += podar_fuentes(coleccion, vigentes)
+    if podar:
+        totales["borrados"] += podar_fuentes_inexistentes(coleccion, set(vigentes))
+    totales["segundos"] = round(time.perf_counter() - inicio, 2)
+    return totales
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directorio")
+    parser.add_argument("--tamano", type=int, default=INGEST_CHUNK_SIZE, help="caracteres por fragmento")
+    parser.add_argument("--solapamiento", type=int, default=INGEST_CHUNK_OVERLAP, help="caracteres de solapamiento")
+    parser.add_argument("--lote", type=int, default=INGEST_BATCH_SIZE, help="fragmentos por lote de embeddings")
+    parser.add_argument("--podar", action="store_true",
+                        help="borrar los fragmentos de archivos que ya no están en el directorio")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        print(f"[ERROR] No existe el directorio {args.directorio}")
+        sys.exit(1)
+    resultado = ingerir_directorio(args.directorio, tamano=args.tamano,
+                                   solapamiento=args.solapamiento, lote=args.lote, podar=args.podar)
+    print(f"[INFO] Ingesta completa: {resultado}")
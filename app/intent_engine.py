@@ -0,0 +1,127 @@
+# app/intent_engine.py
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Por debajo de este umbral la intención se resuelve con el LLM
+INTENT_FAST_PATH_THRESHOLD = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.8"))
+
+ResultadoIntencion = namedtuple("ResultadoIntencion", ["intencion", "confianza", "tiene_entidades"])
+
+# Patrones sobre texto normalizado (minúsculas, sin tildes), con la confianza que otorgan.
+# El orden de las intenciones importa: cancelar/reprogramar se evalúan antes que agendar.
+_PATRONES = {
+    "cancelar_cita": [
+        (r"\b(cancelar|cancela|cancelo|anular|anula|anulo|eliminar|borrar)\b.*\b(cita|turno|consulta|reserva)\b", 0.95),
+        (r"\bya no (puedo|podre|voy a) (ir|asistir|llegar)\b", 0.9),
+        # Sin "cita" puede ser una pregunta ("¿puedo cancelar sin costo?"): que decida el LLM
+        (r"\b(cancelar|anular)\b", 0.6),
+    ],
+    "reprogramar_cita": [
+        (r"\b(reprogramar|reagendar|cambiar|mover|posponer|aplazar|adelantar)\b.*\b(cita|turno|consulta|reserva)\b", 0.95),
+        (r"\b(reprogramar|reagendar|posponer|aplazar)\b", 0.9),
+        (r"\b(otro dia|otra hora|otra fecha)\b", 0.6),
+    ],
+    "agendar_cita": [
+        (r"\b(agendar|reservar|sacar|pedir|programar|separar|solicitar)\b.*\b(cita|turno|consulta|hora)\b", 0.95),
+        (r"\b(quiero|quisiera|necesito|deseo|me gustaria|puedo tener)\b.*\b(cita|turno)\b", 0.9),
+        (r"\b(agendar|reservar|agenda|reserva)\b", 0.85),
+        (r"\b(cita|horario|disponibilidad|odontologo|dentista|limpieza|extraccion|"
+         r"blanqueamiento|ortodoncia|consulta|consultar)\b", 0.5),
+    ],
+    "consulta_general": [
+        (r"^(hola|holi|buenas|buenos dias|buenas tardes|buenas noches|gracias|muchas gracias|"
+         r"ok|okay|vale|perfecto|adios|chau|hasta luego)$", 0.95),
+        (r"^(cual|cuales|cuanto|donde|a que hora|que)\b.*\b(horario|horarios|abren|cierran|ubicacion|"
+         r"direccion|queda|quedan|estan|precio|precios|cuesta|cuestan|costo)\b", 0.85),
+        (r"^(cual|cuanto|cuantos|donde|que|como|a que hora|tienen|hacen|atienden)\b", 0.7),
+    ],
+}
+
+_PATRONES_COMPILADOS = {
+    intencion: [(re.compile(patron), confianza) for patron, confianza in patrones]
+    for intencion, patrones in _PATRONES.items()
+}
+
+# Indicios de que el mensaje trae datos (nombre, doctor, fecha, hora) que solo el LLM extrae
+_ENTIDADES = re.compile(
+    r"\d|\b(dr|dra|doctor|doctora|soy|me llamo|mi nombre|hoy|manana|pasado|lunes|martes|miercoles|"
+    r"jueves|viernes|sabado|domingo|enero|febrero|marzo|abril|mayo|junio|julio|agosto|"
+    r"septiembre|setiembre|octubre|noviembre|diciembre|am|pm|tarde|noche|mediodia)\b"
+)
+# Preguntas sobre una acción ("¿qué pasa si cancelo la cita?") no son pedidos de hacerla
+_PREGUNTA = re.compile(r"\?|^\s*¿|^(que pasa|cuanto|cuanta|como|se puede|puedo|hay que|es posible|tiene costo)\b")
+_INTENCIONES_DE_ACCION = ("cancelar_cita", "reprogramar_cita")
+_NO_ALFANUMERICO = re.compile(r"[^\w\s:]")
+_ESPACIOS = re.compile(r"\s+")
+
+_contadores = {"ruta_rapida": 0, "llm": 0}
+_contadores_lock = threading.Lock()
+
+
+def normalizar(texto: str) -> str:
+    """
+    Pasa a minúsculas, quita tildes y signos, y colapsa espacios.
+    """
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = _NO_ALFANUMERICO.sub(" ", texto)
+    return _ESPACIOS.sub(" ", texto).strip()
+
+
+def clasificar(mensaje: str) -> ResultadoIntencion:
+    """
+    Clasifica el mensaje con reglas locales.
+    Retorna la intención con mayor confianza; si dos intenciones empatan, baja la confianza.
+    """
+    texto = normalizar(mensaje)
+    mejores = []
+    for intencion, patrones in _PATRONES_COMPILADOS.items():
+        for patron, confianza in patrones:
+            if patron.search(texto):
+                mejores.append((confianza, intencion))
+                break
+    tiene_entidades = bool(_ENTIDADES.search(texto))
+    if not mejores:
+        return ResultadoIntencion("consulta_general", 0.0, tiene_entidades)
+
+    mejores.sort(key=lambda m: m[0], reverse=True)
+    confianza, intencion = mejores[0]
+    if intencion in _INTENCIONES_DE_ACCION and (_PREGUNTA.search(mensaje) or _PREGUNTA.search(texto)):
+        confianza -= 0.2
+    # Orden estable: ante empate gana la intención evaluada primero, pero con menos certeza
+    if len(mejores) > 1 and mejores[1][0] == confianza:
+        confianza -= 0.2
+    return ResultadoIntencion(intencion, confianza, tiene_entidades)
+
+
+def detectar_con_ruta_rapida(mensaje: str, detectar_llm, umbral: float = INTENT_FAST_PATH_THRESHOLD):
+    """
+    Resuelve la intención localmente si la confianza supera el umbral;
+    en otro caso delega en `detectar_llm(mensaje)`.
+    Un pedido de cita que trae datos siempre va al LLM para extraer las entidades.
+    """
+    resultado = clasificar(mensaje)
+    necesita_entidades = resultado.intencion == "agendar_cita" and resultado.tiene_entidades
+    if resultado.confianza >= umbral and not necesita_entidades:
+        with _contadores_lock:
+            _contadores["ruta_rapida"] += 1
+        return {"intencion": resultado.intencion, "entidades": {}}
+    with _contadores_lock:
+        _contadores["llm"] += 1
+    return detectar_llm(mensaje)
+
+
+def estadisticas():
+    with _contadores_lock:
+        total = _contadores["ruta_rapida"] + _contadores["llm"]
+        return {
+            **_contadores,
+            "total": total,
+            "tasa_ruta_rapida": round(_contadores["ruta_rapida"] / total, 4) if total else 0.0,
+        }
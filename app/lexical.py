@@ -0,0 +1,138 @@
+# app/lexical.py
+import heapq
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dotenv import load_dotenv
+from app.intent_engine import normalizar
+
+load_dotenv()
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_STOPWORDS = {
+    "a", "al", "algo", "como", "con", "cual", "cuales", "de", "del", "donde", "el", "ella", "en",
+    "es", "esta", "este", "esto", "hay", "la", "las", "le", "lo", "los", "me", "mi", "mis", "muy",
+    "no", "o", "para", "pero", "por", "que", "se", "si", "sin", "su", "sus", "tu", "un", "una",
+    "unos", "unas", "y", "ya", "yo", "hola", "quiero", "quisiera", "puedo", "tienen", "tiene",
+}
+_PALABRA = re.compile(r"\w+")
+
+
+def tokenizar(texto: str):
+    """
+    Tokens normalizados sin stopwords. Quita el plural ("limpiezas" -> "limpieza")
+    para que singular y plural coincidan.
+    """
+    tokens = []
+    for palabra in _PALABRA.findall(normalizar(texto)):
+        if palabra in _STOPWORDS:
+            continue
+        if len(palabra) > 4 and palabra.endswith("es") and palabra[-3] not in "aeiou":
+            palabra = palabra[:-2]
+        elif len(palabra) > 3 and palabra.endswith("s"):
+            palabra = palabra[:-1]
+        tokens.append(palabra)
+    return tokens
+
+
+class BM25Index:
+    """
+    Índice invertido en memoria con puntaje BM25.
+    """
+
+    def __init__(self, ids, documentos, k1=BM25_K1, b=BM25_B):
+        self.ids = list(ids)
+        self.documentos = list(documentos)
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # término -> [(posición del documento, frecuencia)]
+        self._largos = []
+        for n, documento in enumerate(self.documentos):
+            frecuencias = Counter(tokenizar(documento))
+            self._largos.append(sum(frecuencias.values()))
+            for termino, tf in frecuencias.items():
+                self._postings.setdefault(termino, []).append((n, tf))
+        self._largo_medio = (sum(self._largos) / len(self._largos)) if self._largos else 0.0
+        total = len(self.documentos)
+        self._idf = {
+            termino: math.log(1 + (total - len(p) + 0.5) / (len(p) + 0.5))
+            for termino, p in self._postings.items()
+        }
+        # Peso de un término que no aparece en ningún documento
+        self._idf_ausente = math.log(1 + (total + 0.5) / 0.5)
+
+    def __len__(self):
+        return len(self.documentos)
+
+    def buscar(self, consulta, top_k=3):
+        """
+        Retorna [(posición, puntaje, cobertura)] de los top_k documentos, de mayor a menor puntaje.
+        La cobertura es la fracción del peso idf de la consulta cuyos términos aparecen en el documento.
+        """
+        puntajes, cubierto = {}, {}
+        peso_total = 0.0
+        for termino in set(tokenizar(consulta)):
+            postings = self._postings.get(termino)
+            if not postings:
+                peso_total += self._idf_ausente
+                continue
+            idf = self._idf[termino]
+            peso_total += idf
+            for n, tf in postings:
+                norma = self.k1 * (1 - self.b + self.b * self._largos[n] / (self._largo_medio or 1))
+                puntajes[n] = puntajes.get(n, 0.0) + idf * tf * (self.k1 + 1) / (tf + norma)
+                cubierto[n] = cubierto.get(n, 0.0) + idf
+        if len(puntajes) <= top_k:
+            mejores = sorted(puntajes.items(), key=lambda p: p[1], reverse=True)
+        else:
+            mejores = heapq.nlargest(top_k, puntajes.items(), key=lambda p: p[1])
+        return [(n, puntaje, cubierto[n] / peso_total) for n, puntaje in mejores]
+
+
+# Cada cuánto se compara el tamaño de la colección para detectar cargas de otro proceso
+LEXICAL_REFRESH_SECONDS = int(os.getenv("LEXICAL_REFRESH_SECONDS", "300"))
+
+_indices = {}  # nombre de colección -> (índice, cantidad de documentos, última verificación)
+_indices_lock = threading.Lock()
+
+
+def _construir(coleccion, pagina=5000):
+    ids, documentos = [], []
+    total = coleccion.count()
+    for desde in range(0, total, pagina):
+        lote = coleccion.get(include=["documents"], limit=pagina, offset=desde)
+        ids += lote["ids"]
+        documentos += lote["documents"]
+    return BM25Index(ids, documentos), total
+
+
+def indice_para(coleccion) -> BM25Index:
+    """
+    Índice BM25 sobre los documentos de la colección, construido en el primer uso.
+    Se reconstruye tras invalidar_indices() o si la colección cambió de tamaño.
+    """
+    ahora = time.monotonic()
+    entrada = _indices.get(coleccion.name)
+    if entrada is not None and ahora - entrada[2] < LEXICAL_REFRESH_SECONDS:
+        return entrada[0]
+    with _indices_lock:
+        entrada = _indices.get(coleccion.name)
+        if entrada is not None and ahora - entrada[2] < LEXICAL_REFRESH_SECONDS:
+            return entrada[0]
+        if entrada is not None and coleccion.count() == entrada[1]:
+            _indices[coleccion.name] = (entrada[0], entrada[1], ahora)
+            return entrada[0]
+        indice, total = _construir(coleccion)
+        _indices[coleccion.name] = (indice, total, ahora)
+        print(f"[INFO] Índice léxico de {coleccion.name}: {total} documentos en {time.monotonic() - ahora:.2f} s")
+        return indice
+
+
+def invalidar_indices():
+    with _indices_lock:
+        _indices.clear()
@@ -1,4 +1,6 @@
 from app import db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, validates
 
 class Appointment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,6 +10,140 @@ class Appointment(db.Model):
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, confirmed, canceled, no_show
+    # Recordatorios: el worker que reclama la cita y cuándo se envió
+    reminder_claim = db.Column(db.String(32), nullable=True)
+    reminder_claimed_at = db.Column(db.DateTime, nullable=True)
+    reminder_sent_at = db.Column(db.DateTime, nullable=True)
+    # Envíos fallidos y cuándo se puede reintentar; al llegar al máximo la cita no se reintenta más
+    reminder_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reminder_next_attempt_at = db.Column(db.DateTime, nullable=True)
+    # True mientras la cita ocupa su horario, NULL si está cancelada: el índice único
+    # sobre (date, time, slot_activo) ignora los NULL, así que solo choca entre citas activas
+    slot_activo = db.Column(db.Boolean, nullable=True, default=True)
+
+    __table_args__ = (
+        db.Index('ix_appointment_status_date_time', 'status', 'date', 'time'),
+        db.Index('uq_appointment_slot_activo', 'date', 'time', 'slot_activo', unique=True),
+        db.Index('ix_appointment_patient_phone', 'patient_phone'),
+    )
+
+    # Campos públicos, en el orden de to_dict() y de las columnas del CSV
+    CAMPOS = ('id', 'patient_name', 'patient_phone', 'service_type', 'date', 'time', 'status', 'reminder_sent_at')
+
+    @validates('status')
+    def _sincronizar_slot(self, key, status):
+        self.slot_activo = None if status == 'canceled' else True
+        return status
 
     def to_dict(self):
-        return f"<Appointment {self.id} - {self.patient_name} on {self.date} at {self.time}>"
\ No newline at end of file
+        return {
+            "id": self.id,
+            "patient_name": self.patient_name,
+            "patient_phone": self.patient_phone,
+            "service_type": self.service_type,
+            "date": self.date.isoformat() if self.date else None,
+            "time": self.time.strftime("%H:%M:%S") if self.time else None,
+            "status": self.status,
+            "reminder_sent_at": self.reminder_sent_at.isoformat() if self.reminder_sent_at else None,
+        }
+
+    def __repr__(self):
+        return f"<Appointment {self.id} - {self.patient_name} on {self.date} at {self.time}>"
+
+class AvailabilityVersion(db.Model):
+    """Versión por día de las citas; cambia en la misma transacción que cualquier escritura de Appointment"""
+    __tablename__ = 'availability_version'
+    date = db.Column(db.Date, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+
+def _incrementar_versiones(connection, fechas):
+    """
+    Upsert que suma 1 a la versión de cada fecha (o la crea en 1), según el dialecto.
+    """
+    tabla = AvailabilityVersion.__table__
+    filas = [{"date": fecha, "version": 1} for fecha in sorted(fechas)]
+    if connection.dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        sentencia = insert(tabla).values(filas)
+        sentencia = sentencia.on_duplicate_key_update(version=tabla.c.version + 1)
+    else:
+        # PostgreSQL y SQLite comparten la sintaxis ON CONFLICT
+        if connection.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        sentencia = insert(tabla).values(filas)
+        sentencia = sentencia.on_conflict_do_update(index_elements=[tabla.c.date],
+                                                    set_={"version": tabla.c.version + 1})
+    connection.execute(sentencia)
+
+
+@event.listens_for(Session, "after_flush")
+def _versionar_disponibilidad(session, flush_context):
+    """
+    Tras cada flush que toca el horario de una cita (alta, baja, fecha, hora o estado),
+    incrementa la versión de los días afectados, incluidos los días que la cita dejó.
+    """
+    fechas = set()
+    for cita in list(session.new) + list(session.deleted):
+        if isinstance(cita, Appointment):
+            fechas.add(cita.date)
+    for cita in session.dirty:
+        if not isinstance(cita, Appointment):
+            continue
+        estado = inspect(cita)
+        if any(estado.attrs[campo].history.has_changes() for campo in ("date", "time", "status")):
+            fechas.add(cita.date)
+            fechas.update(estado.attrs.date.history.deleted)
+    fechas.discard(None)
+    if fechas:
+        _incrementar_versiones(session.connection(), fechas)
+
+
+class ConversationState(db.Model):
+    __tablename__ = 'conversation_states'
+    from_number = db.Column(db.String(32), primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # estado serializado en JSON
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+class ProcessedMessage(db.Model):
+    __tablename__ = 'processed_messages'
+    message_sid = db.Column(db.String(64), primary_key=True)
+    resultado = db.Column(db.Text, nullable=True)  # respuesta del webhook en JSON, null mientras se procesa
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+class OutboundDeadLetter(db.Model):
+    """Envíos de WhatsApp descartados tras agotar los reintentos"""
+    __tablename__ = 'outbound_dead_letters'
+    id = db.Column(db.Integer, primary_key=True)
+    to_number = db.Column(db.String(64), nullable=False)
+    from_number = db.Column(db.String(64), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    intentos = db.Column(db.Integer, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+class InboundMessage(db.Model):
+    """
+    Mensajes de WhatsApp confirmados a Twilio antes de procesarse. Un mensaje que no
+    llega a completarse (el proceso cayó o el turno falló) se vuelve a entregar.
+    """
+    __tablename__ = 'inbound_messages'
+    message_sid = db.Column(db.String(64), primary_key=True)
+    from_number = db.Column(db.String(64), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pendiente')  # pendiente, procesando, completado, fallido
+    intentos = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_inbound_messages_status_updated_at', 'status', 'updated_at'),
+    )
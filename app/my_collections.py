@@ -1,11 +1,74 @@
-import chromadb
+import hashlib
+import os
+import threading
+import time
 from flask import Blueprint
+from dotenv import load_dotenv
+from app.embeddings import get_embedder, nombre_coleccion
+from app.lexical import invalidar_indices
+
+load_dotenv()
+# Directorio donde Chroma persiste el índice entre reinicios
+CHROMA_PATH = os.getenv("CHROMA_PATH", "chroma_db")
 
 bp = Blueprint('my_collections', __name__)
 
+# El cliente y la colección se crean en el primer uso, no al importar el módulo
+_chroma_client = None
+_mi_coleccion = None
+_init_lock = threading.RLock()  # get_coleccion() llama a get_chroma_client() con el lock tomado
+
+
+def hash_contenido(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def id_documento(prefijo: str, texto: str) -> str:
+    """
+    Id estable derivado del contenido: no cambia si la lista se reordena
+    o se le quitan documentos.
+    """
+    return f"{prefijo}_{hash_contenido(texto)[:16]}"
 
-chroma_client = chromadb.Client()
-mi_coleccion = chroma_client.create_collection(name="mi_coleccion")
+
+def sincronizar_documentos(coleccion, documentos, ids, metadatas=None, origen=None) -> int:
+    """
+    Inserta o actualiza solo los documentos nuevos o modificados, comparando el hash
+    del contenido con el guardado en la metadata. Con `origen`, la lista es el conjunto
+    completo de ese origen: se etiquetan con él y se borran los documentos del mismo
+    origen que ya no están. Retorna cuántos se embebieron.
+    """
+    metadatas = metadatas or [{} for _ in ids]
+    if origen is not None:
+        metadatas = [{**m, "origen": origen} for m in metadatas]
+        podar_documentos(coleccion, {"origen": origen}, set(ids))
+    if not ids:
+        return 0
+    existentes = coleccion.get(ids=ids, include=["metadatas"])
+    hashes = {i: (m or {}).get("hash") for i, m in zip(existentes["ids"], existentes["metadatas"])}
+    cambios = [(i, d, {**m, "hash": hash_contenido(d)}) for i, d, m in zip(ids, documentos, metadatas)]
+    cambios = [(i, d, m) for i, d, m in cambios if hashes.get(i) != m["hash"]]
+    if cambios:
+        coleccion.upsert(
+            ids=[i for i, _, _ in cambios],
+            documents=[d for _, d, _ in cambios],
+            metadatas=[m for _, _, m in cambios],
+            embeddings=get_embedder().embeber([d for _, d, _ in cambios])
+        )
+        invalidar_indices()
+    return len(cambios)
+
+
+def podar_documentos(coleccion, where, vigentes) -> int:
+    """
+    Borra los documentos que cumplen el filtro `where` y cuyo id no está en `vigentes`.
+    Retorna cuántos se borraron.
+    """
+    sobrantes = [i for i in coleccion.get(where=where, include=[])["ids"] if i not in vigentes]
+    if sobrantes:
+        coleccion.delete(ids=sobrantes)
+        invalidar_indices()
+    return len(sobrantes)
 
 
 # Textos de ejemplo (pueden ser respuestas, información de empresa, etc.)
@@ -13,16 +76,10 @@ documentos = [
     "Oberoende ofrece soluciones de chatbots conectados con WhatsApp y otras plataformas.",
     "Nuestros chatbots pueden responder preguntas frecuentes y automatizar tareas repetitivas.",
     "Implementamos integraciones personalizadas usando Twilio, Flask y APIs REST.",
-    "Los modelos de lenguaje permiten mejorar la comprensión del contexto y dar respuestas más naturales."
+    "Los modelos de lenguaje permiten mejorar la comprensión del contexto y dar respuestas más naturales.",
     "Oberoende es la empresa que… ofrece soluciones de chatbots conectados con WhatsApp… y otras plataformas.",
 ]
 
-# Agregamos los documentos a la colección con sus embeddings
-mi_coleccion.add(
-    documents=documentos,
-    ids=[f"doc_{i}" for i in range(len(documentos))]
-)
-
 # En my_collections.py - Agregar documentos dentales
 documentos_odontologia = [
     "Limpieza dental: procedimiento de 45 minutos, requiere ayuno de 2 horas antes",
@@ -37,10 +94,60 @@ documentos_odontologia = [
     "Emergencias dentales: atendemos el mismo día, llamar al +123456789"
 ]
 
-# Reemplaza o agrega a tu colección existente
-mi_coleccion.add(
-    documents=documentos_odontologia,
-    ids=[f"dental_doc_{i}" for i in range(len(documentos_odontologia))]
-)
 
-print("✅ Documentos guardados en la base vectorial local.")
\ No newline at end of file
+def get_chroma_client():
+    """Cliente persistente de Chroma, creado en el primer uso"""
+    global _chroma_client
+    if _chroma_client is None:
+        with _init_lock:
+            if _chroma_client is None:
+                import chromadb
+
+                _chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _chroma_client
+
+
+def get_coleccion():
+    """
+    Colección de la base de conocimiento. La primera llamada la abre y sincroniza
+    los documentos; las siguientes la devuelven directamente.
+    """
+    global _mi_coleccion
+    if _mi_coleccion is not None:
+        return _mi_coleccion
+    with _init_lock:
+        if _mi_coleccion is None:
+            _mi_coleccion = _abrir_coleccion()
+    return _mi_coleccion
+
+
+def coleccion_lista() -> bool:
+    return _mi_coleccion is not None
+
+
+def _abrir_coleccion():
+    inicio = time.perf_counter()
+    mi_coleccion = get_chroma_client().get_or_create_collection(name=nombre_coleccion("mi_coleccion"))
+
+    # Agregamos los documentos a la colección; solo se embeben los que cambiaron
+    # y se borran los que se quitaron de las listas
+    embebidos = 0
+    for origen, prefijo, textos in (("documentos", "doc", documentos),
+                                    ("documentos_odontologia", "dental_doc", documentos_odontologia)):
+        textos = list(dict.fromkeys(textos))  # un texto repetido tendría el mismo id
+        # Ids por posición de versiones anteriores, que no llevan origen en la metadata
+        legado = mi_coleccion.get(ids=[f"{prefijo}_{i}" for i in range(max(len(textos), 1))], include=[])["ids"]
+        if legado:
+            mi_coleccion.delete(ids=legado)
+        embebidos += sincronizar_documentos(
+            mi_coleccion,
+            textos,
+            [id_documento(prefijo, t) for t in textos],
+            origen=origen
+        )
+
+    print(
+        f"✅ Base vectorial lista en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+        f"({embebidos} documentos embebidos, {mi_coleccion.count()} en total)."
+    )
+    return mi_coleccion
@@ -0,0 +1,246 @@
+# app/outbound.py
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+import requests
+from dotenv import load_dotenv
+from app.http_clients import get_twilio_client
+
+load_dotenv()
+
+TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
+# Límite por número remitente (token bucket): mensajes por segundo y ráfaga permitida.
+# 80/s es el throughput por defecto de un remitente de WhatsApp en Twilio
+OUTBOUND_RATE_PER_SECOND = float(os.getenv("OUTBOUND_RATE_PER_SECOND", "80"))
+OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", "80"))
+OUTBOUND_MAX_IN_FLIGHT = int(os.getenv("OUTBOUND_MAX_IN_FLIGHT", "8"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "4"))
+OUTBOUND_BACKOFF_SECONDS = float(os.getenv("OUTBOUND_BACKOFF_SECONDS", "1"))
+# Dead letters que se guardan en memoria si no hay app para persistirlas
+OUTBOUND_DEAD_LETTER_MAX = int(os.getenv("OUTBOUND_DEAD_LETTER_MAX", "1000"))
+# Cuánto espera enviar_y_esperar() el SID antes de rendirse
+OUTBOUND_RESULT_TIMEOUT = float(os.getenv("OUTBOUND_RESULT_TIMEOUT", "60"))
+
+
+class TokenBucket:
+    """
+    Token bucket simple: `tasa` tokens por segundo hasta `capacidad`.
+    """
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self) -> float:
+        """
+        Consume un token. Retorna los segundos que hay que esperar antes de usarlo.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.tasa
+
+
+class _Envio:
+    def __init__(self, to, body, from_, app=None):
+        self.to = to
+        self.body = body
+        self.from_ = from_
+        self.app = app  # para guardar el dead letter en la base
+        self.intentos = 0
+        self.reservado = False  # ya tomó su token del bucket
+        self.iniciado = False
+        self.encolado = time.monotonic()
+        self.future = Future()
+
+
+def _es_reintentable(error) -> bool:
+    status = getattr(error, "status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class OutboundDispatcher:
+    """
+    Cola de envíos de WhatsApp: limita la tasa por remitente, envía en paralelo hasta
+    `max_en_vuelo`, reintenta con backoff ante 429/5xx y guarda en dead letters
+    los envíos que siguen fallando.
+    """
+
+    def __init__(self, max_en_vuelo=OUTBOUND_MAX_IN_FLIGHT, tasa=OUTBOUND_RATE_PER_SECOND,
+                 rafaga=OUTBOUND_BURST, max_reintentos=OUTBOUND_MAX_RETRIES,
+                 backoff=OUTBOUND_BACKOFF_SECONDS):
+        self.max_en_vuelo = max_en_vuelo
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.max_reintentos = max_reintentos
+        self.backoff = backoff
+        self._cola = queue.Queue()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._en_espera = 0  # reintentos programados que aún no vuelven a la cola
+        self.dead_letters = deque(maxlen=OUTBOUND_DEAD_LETTER_MAX)
+        self._latencias = deque(maxlen=500)
+        self.enviados = 0
+        self.reintentos = 0
+        self.fallidos = 0
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilos:
+                return
+            for i in range(self.max_en_vuelo):
+                hilo = threading.Thread(target=self._trabajar, name=f"outbound-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def _bucket(self, remitente):
+        with self._lock:
+            if remitente not in self._buckets:
+                self._buckets[remitente] = TokenBucket(self.tasa, self.rafaga)
+            return self._buckets[remitente]
+
+    def enviar(self, to, body, from_=None) -> Future:
+        """
+        Encola un mensaje. Retorna un Future que se resuelve con el SID de Twilio.
+        Mientras el envío no empezó, future.cancel() lo saca de la cola.
+        """
+        from flask import current_app, has_app_context
+
+        self._iniciar()
+        app = current_app._get_current_object() if has_app_context() else None
+        envio = _Envio(to, body, from_ or TWILIO_WHATSAPP_NUMBER, app)
+        self._cola.put(envio)
+        return envio.future
+
+    def enviar_y_esperar(self, to, body, from_=None, timeout=OUTBOUND_RESULT_TIMEOUT):
+        """
+        Encola el mensaje y espera el SID; propaga el error si el envío falla.
+        Si se agota la espera y el envío no empezó, se cancela y se propaga el timeout;
+        si ya está en curso (o reintentándose) retorna None: el mensaje sale igual.
+        """
+        future = self.enviar(to, body, from_)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise
+            print(f"[INFO] Envío a {to} sigue en curso tras {timeout} s; se informa como pendiente")
+            return None
+
+    def _reencolar(self, envio):
+        with self._lock:
+            self._en_espera -= 1
+        self._cola.put(envio)
+
+    def _programar(self, espera, envio):
+        """
+        Devuelve el envío a la cola dentro de `espera` segundos sin ocupar un worker.
+        """
+        with self._lock:
+            self._en_espera += 1
+        timer = threading.Timer(espera, self._reencolar, args=(envio,))
+        timer.daemon = True
+        timer.start()
+
+    def _trabajar(self):
+        while True:
+            envio = self._cola.get()
+            try:
+                if envio.future.cancelled():
+                    continue
+                if not envio.reservado:
+                    # El bucket solo calcula la espera; el envío espera fuera del worker
+                    # para que los demás remitentes sigan saliendo
+                    espera = self._bucket(envio.from_).tomar()
+                    envio.reservado = True
+                    if espera:
+                        self._programar(espera, envio)
+                        continue
+                if not envio.iniciado:
+                    if not envio.future.set_running_or_notify_cancel():
+                        continue
+                    envio.iniciado = True
+                mensaje = get_twilio_client().messages.create(
+                    from_=envio.from_,
+                    to=envio.to,
+                    body=envio.body
+                )
+                self.enviados += 1
+                self._latencias.append((time.monotonic() - envio.encolado) * 1000)
+                envio.future.set_result(mensaje.sid)
+            except Exception as e:
+                self._fallo(envio, e)
+            finally:
+                self._cola.task_done()
+
+    def _fallo(self, envio, error):
+        if _es_reintentable(error) and envio.intentos < self.max_reintentos:
+            envio.intentos += 1
+            self.reintentos += 1
+            envio.reservado = False
+            self._programar(self.backoff * (2 ** (envio.intentos - 1)), envio)
+            return
+        self.fallidos += 1
+        print(f"[ERROR] Envío a {envio.to} descartado tras {envio.intentos + 1} intentos: {error}")
+        self._guardar_dead_letter(envio, error)
+        if not envio.future.done():
+            envio.future.set_exception(error)
+
+    def _guardar_dead_letter(self, envio, error):
+        """
+        Persiste el envío descartado en outbound_dead_letters. Sin app (o si la base
+        falla) queda en la lista en memoria, que se pierde al reiniciar.
+        """
+        registro = {
+            "to": envio.to,
+            "from": envio.from_,
+            "body": envio.body,
+            "intentos": envio.intentos + 1,
+            "error": str(error),
+            "fecha": datetime.now(timezone.utc),
+        }
+        if envio.app is not None:
+            from app import db
+            from app.models import OutboundDeadLetter
+
+            try:
+                with envio.app.app_context():
+                    db.session.add(OutboundDeadLetter(
+                        to_number=registro["to"], from_number=registro["from"], body=registro["body"],
+                        intentos=registro["intentos"], error=registro["error"], created_at=registro["fecha"]
+                    ))
+                    db.session.commit()
+                return
+            except Exception as e:
+                print(f"[ERROR] No se pudo guardar el dead letter de {envio.to}: {e}")
+        self.dead_letters.append({**registro, "fecha": registro["fecha"].isoformat()})
+
+    def estadisticas(self):
+        latencias = sorted(self._latencias)
+        return {
+            "en_cola": self._cola.qsize() + self._en_espera,
+            "enviados": self.enviados,
+            "reintentos": self.reintentos,
+            "fallidos": self.fallidos,
+            "dead_letters": len(self.dead_letters),
+            "latencia_ms_p50": round(latencias[len(latencias) // 2], 1) if latencias else None,
+            "latencia_ms_p95": round(latencias[int(len(latencias) * 0.95)], 1) if latencias else None,
+        }
+
+
+# Despachador compartido por los webhooks de WhatsApp, Calendly y los recordatorios
+dispatcher = OutboundDispatcher()
@@ -0,0 +1,92 @@
+# app/readiness.py
+import os
+import threading
+import time
+from flask import Blueprint, current_app, jsonify
+from dotenv import load_dotenv
+from app.my_collections import get_coleccion, coleccion_lista
+from app.http_clients import get_llm_client, get_twilio_client, clientes_iniciados
+
+load_dotenv()
+
+# Si está activo, el índice y los clientes se inicializan en segundo plano al arrancar;
+# si no, el primer /ready que los encuentra sin crear lanza el warmup
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "false").lower() in ("1", "true", "yes")
+# Clientes que deben estar creados para considerar la app lista
+CLIENTES_REQUERIDOS = ("llm:xai", "twilio")
+
+bp = Blueprint('readiness', __name__)
+
+_estado = {"warmup": "pendiente", "duracion_ms": None, "error": None}
+_warmup_lock = threading.Lock()
+
+
+def calentar():
+    """
+    Inicializa la colección vectorial y los clientes HTTP compartidos.
+    Retorna la duración en milisegundos.
+    """
+    inicio = time.perf_counter()
+    _estado["warmup"] = "en_curso"
+    try:
+        get_coleccion()
+        get_llm_client("xai")
+        get_twilio_client()
+    except Exception as e:
+        _estado.update(warmup="error", error=str(e))
+        print(f"[ERROR] warmup: {e}")
+        raise
+    duracion = (time.perf_counter() - inicio) * 1000
+    _estado.update(warmup="completo", duracion_ms=round(duracion, 1), error=None)
+    print(f"[INFO] Warmup completo en {duracion:.0f} ms")
+    return duracion
+
+
+def lanzar_warmup(app) -> bool:
+    """
+    Lanza calentar() en un hilo salvo que ya esté en curso o completo (tras un error
+    se puede relanzar). Retorna True si lo lanzó.
+    """
+    with _warmup_lock:
+        if _estado["warmup"] not in ("pendiente", "error"):
+            return False
+        _estado["warmup"] = "en_curso"
+
+    def ciclo():
+        try:
+            with app.app_context():
+                calentar()
+        except Exception:
+            pass  # el error queda en _estado y /ready sigue respondiendo 503
+
+    threading.Thread(target=ciclo, name="warmup", daemon=True).start()
+    return True
+
+
+def iniciar_warmup(app):
+    """
+    Lanza el warmup al arrancar si WARMUP_ON_START; la app acepta tráfico mientras tanto.
+    """
+    if WARMUP_ON_START:
+        lanzar_warmup(app)
+
+
+def esta_listo():
+    iniciados = clientes_iniciados()
+    componentes = {
+        "indice": coleccion_lista(),
+        **{clave: clave in iniciados for clave in CLIENTES_REQUERIDOS},
+    }
+    return all(componentes.values()), componentes
+
+
+@bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    200 cuando el índice y los clientes están inicializados; 503 mientras no.
+    Sin WARMUP_ON_START, la primera consulta que responde 503 lanza el warmup.
+    """
+    listo, componentes = esta_listo()
+    if not listo:
+        lanzar_warmup(current_app._get_current_object())
+    return jsonify({"listo": listo, "componentes": componentes, **_estado}), 200 if listo else 503
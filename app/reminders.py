@@ -0,0 +1,200 @@
+# app/reminders.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from functools import partial
+from flask import current_app
+from sqlalchemy import and_, or_
+from dotenv import load_dotenv
+from app import db
+from app.models import Appointment
+from app.outbound import dispatcher
+
+load_dotenv()
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Se recuerdan las citas que empiezan dentro de las próximas N horas
+REMINDER_WINDOW_HOURS = float(os.getenv("REMINDER_WINDOW_HOURS", "24"))
+REMINDER_INTERVAL_SECONDS = int(os.getenv("REMINDER_INTERVAL_SECONDS", "300"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+# Un reclamo más viejo que esto se considera de un worker caído y se puede retomar
+REMINDER_CLAIM_TIMEOUT_SECONDS = int(os.getenv("REMINDER_CLAIM_TIMEOUT_SECONDS", "900"))
+REMINDER_SEND_TIMEOUT_SECONDS = int(os.getenv("REMINDER_SEND_TIMEOUT_SECONDS", "300"))
+# Tras un envío fallido se espera RETRY_SECONDS * 2^(intentos - 1) antes de reintentar;
+# al llegar a MAX_ATTEMPTS la cita queda descartada (no se reintenta más)
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "5"))
+REMINDER_RETRY_SECONDS = int(os.getenv("REMINDER_RETRY_SECONDS", "600"))
+
+ESTADOS_RECORDABLES = ('pending', 'confirmed')
+
+
+def _filtro_ventana(desde: datetime, hasta: datetime):
+    """
+    Condición de rango sobre (date, time) usable por el índice status/date/time.
+    """
+    d0, t0, d1, t1 = desde.date(), desde.time(), hasta.date(), hasta.time()
+    if d0 == d1:
+        return and_(Appointment.date == d0, Appointment.time >= t0, Appointment.time <= t1)
+    return or_(
+        and_(Appointment.date == d0, Appointment.time >= t0),
+        and_(Appointment.date > d0, Appointment.date < d1),
+        and_(Appointment.date == d1, Appointment.time <= t1),
+    )
+
+
+def _sin_reclamo_vigente(ahora):
+    vencido = ahora - timedelta(seconds=REMINDER_CLAIM_TIMEOUT_SECONDS)
+    return or_(Appointment.reminder_claim.is_(None), Appointment.reminder_claimed_at < vencido)
+
+
+def reclamar_lote(ahora=None, ventana_horas=REMINDER_WINDOW_HOURS, limite=REMINDER_BATCH_SIZE):
+    """
+    Marca como reclamadas hasta `limite` citas de la ventana que aún no tienen recordatorio,
+    no agotaron sus intentos, no esperan un reintento y no tienen un reclamo vigente.
+    Usa tres consultas sin importar el tamaño del lote. Retorna (token, citas).
+    """
+    ahora = ahora or datetime.now()
+    token = uuid.uuid4().hex
+    condicion = and_(
+        Appointment.status.in_(ESTADOS_RECORDABLES),
+        _filtro_ventana(ahora, ahora + timedelta(hours=ventana_horas)),
+        Appointment.reminder_sent_at.is_(None),
+        Appointment.reminder_attempts < REMINDER_MAX_ATTEMPTS,
+        or_(Appointment.reminder_next_attempt_at.is_(None), Appointment.reminder_next_attempt_at <= ahora),
+        _sin_reclamo_vigente(ahora),
+    )
+    ids = [fila.id for fila in db.session.query(Appointment.id).filter(condicion)
+           .order_by(Appointment.date, Appointment.time).limit(limite)]
+    if not ids:
+        return token, []
+
+    # El UPDATE condicional es el que decide: si otro worker reclamó antes, la fila no cambia
+    Appointment.query.filter(Appointment.id.in_(ids), _sin_reclamo_vigente(ahora)).update(
+        {"reminder_claim": token, "reminder_claimed_at": ahora}, synchronize_session=False
+    )
+    db.session.commit()
+    return token, Appointment.query.filter_by(reminder_claim=token).all()
+
+
+def _numero_whatsapp(telefono):
+    return telefono if telefono.startswith("whatsapp:") else f"whatsapp:{telefono}"
+
+
+def _mensaje_recordatorio(cita):
+    return (
+        f"⏰ Recordatorio: {cita.patient_name}, tienes una cita de {cita.service_type} "
+        f"el {cita.date.strftime('%Y-%m-%d')} a las {cita.time.strftime('%H:%M')} "
+        f"en Clínica Dental Sonrisa Saludable. Si no puedes asistir, avísanos por aquí."
+    )
+
+
+def _registrar_resultados(token, enviadas, fallidas, intentos):
+    """
+    Marca las citas enviadas y libera las fallidas con un reintento diferido (backoff
+    exponencial); las que llegan a REMINDER_MAX_ATTEMPTS quedan descartadas.
+    Solo toca filas que siguen reclamadas con `token`.
+    """
+    ahora = datetime.now()
+    if enviadas:
+        Appointment.query.filter(Appointment.id.in_(enviadas), Appointment.reminder_claim == token).update(
+            {"reminder_sent_at": ahora}, synchronize_session=False
+        )
+    # Un UPDATE por cantidad de intentos previos, que son pocos valores distintos
+    por_intentos = {}
+    for cid in fallidas:
+        por_intentos.setdefault(intentos[cid] + 1, []).append(cid)
+    for n, ids in por_intentos.items():
+        Appointment.query.filter(Appointment.id.in_(ids), Appointment.reminder_claim == token).update({
+            "reminder_claim": None,
+            "reminder_claimed_at": None,
+            "reminder_attempts": n,
+            "reminder_next_attempt_at": ahora + timedelta(seconds=REMINDER_RETRY_SECONDS * 2 ** (n - 1)),
+        }, synchronize_session=False)
+        if n >= REMINDER_MAX_ATTEMPTS:
+            print(f"[ERROR] Recordatorios descartados tras {n} intentos: citas {ids}")
+    db.session.commit()
+
+
+def _registrar_al_terminar(app, token, cid, intentos, future):
+    """
+    Callback de un envío que seguía en curso al vencer la espera del lote.
+    """
+    try:
+        with app.app_context():
+            if future.exception() is None:
+                _registrar_resultados(token, [cid], [], {})
+            else:
+                _registrar_resultados(token, [], [cid], {cid: intentos})
+    except Exception as e:
+        # El reclamo vence solo y la cita se retoma en otra corrida
+        print(f"[ERROR] No se pudo registrar el recordatorio de la cita {cid}: {e}")
+
+
+def enviar_lote(citas, token):
+    """
+    Entrega el lote al despachador de salida y registra el resultado.
+    Al vencer REMINDER_SEND_TIMEOUT_SECONDS, los envíos que siguen en cola se cancelan y
+    cuentan como fallidos; los que ya salieron hacia Twilio conservan el reclamo y registran
+    su resultado cuando terminan. Retorna (enviados, fallidos) de lo resuelto en la espera.
+    """
+    intentos = {c.id: c.reminder_attempts or 0 for c in citas}
+    envios = {dispatcher.enviar(_numero_whatsapp(c.patient_phone), _mensaje_recordatorio(c)): c.id for c in citas}
+    wait(envios, timeout=REMINDER_SEND_TIMEOUT_SECONDS)
+
+    enviadas, fallidas, en_curso = [], [], []
+    app = current_app._get_current_object()
+    for f, cid in envios.items():
+        if f.done() or f.cancel():
+            (enviadas if not f.cancelled() and f.exception() is None else fallidas).append(cid)
+        else:
+            en_curso.append(cid)
+            f.add_done_callback(partial(_registrar_al_terminar, app, token, cid, intentos[cid]))
+    if en_curso:
+        print(f"[INFO] Recordatorios aún en curso, se registran al terminar: citas {en_curso}")
+    _registrar_resultados(token, enviadas, fallidas, intentos)
+    return len(enviadas), len(fallidas)
+
+
+def ejecutar_recordatorios(ahora=None):
+    """
+    Procesa todos los lotes pendientes de la ventana. Retorna (enviados, fallidos).
+    """
+    total_enviados = total_fallidos = 0
+    while True:
+        # Las enviadas, las que esperan reintento y las en curso (aún reclamadas)
+        # ya no cumplen el filtro de reclamar_lote
+        token, citas = reclamar_lote(ahora)
+        if not citas:
+            break
+        enviados, fallidos = enviar_lote(citas, token)
+        total_enviados += enviados
+        total_fallidos += fallidos
+        # Un lote sin ningún envío exitoso (p. ej. Twilio caído) corta la corrida
+        if len(citas) < REMINDER_BATCH_SIZE or not enviados:
+            break
+    if total_enviados or total_fallidos:
+        print(f"[INFO] Recordatorios enviados: {total_enviados}, fallidos: {total_fallidos}")
+    return total_enviados, total_fallidos
+
+
+def iniciar_scheduler_recordatorios(app, intervalo=REMINDER_INTERVAL_SECONDS):
+    """
+    Lanza el hilo que ejecuta los recordatorios cada `intervalo` segundos, si REMINDERS_ENABLED.
+    Varios workers pueden correrlo a la vez: el reclamo evita envíos duplicados.
+    """
+    if not REMINDERS_ENABLED:
+        return
+
+    def ciclo():
+        while True:
+            try:
+                with app.app_context():
+                    ejecutar_recordatorios()
+            except Exception as e:
+                print(f"[ERROR] recordatorios: {e}")
+            time.sleep(intervalo)
+
+    threading.Thread(target=ciclo, name="reminder-scheduler", daemon=True).start()
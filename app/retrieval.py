@@ -0,0 +1,106 @@
+# app/retrieval.py
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+from app.my_collections import get_coleccion
+from app.embeddings import get_embedder
+from app.lexical import indice_para
+
+load_dotenv()
+
+# Modo de recuperación: hybrid | lexical | vector
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Constante k de reciprocal rank fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Candidatos que aporta cada búsqueda a la fusión
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+# Ruta rápida: se omite la búsqueda vectorial si el mejor documento BM25 cubre al menos
+# esta fracción del peso de la consulta y le saca al segundo al menos este margen (cociente)
+LEXICAL_EARLY_EXIT_COVERAGE = float(os.getenv("LEXICAL_EARLY_EXIT_COVERAGE", "0.8"))
+LEXICAL_EARLY_EXIT_MARGIN = float(os.getenv("LEXICAL_EARLY_EXIT_MARGIN", "1.5"))
+
+MODOS = ("hybrid", "lexical", "vector")
+
+_contadores = {"lexica_rapida": 0, "hibrida": 0, "lexica": 0, "vectorial": 0}
+_latencias = {modo: deque(maxlen=500) for modo in _contadores}
+_lock = threading.Lock()
+
+
+def _buscar_vectorial(coleccion, pregunta, n):
+    results = coleccion.query(
+        query_embeddings=get_embedder().embeber([pregunta]),
+        n_results=n
+    )
+    return results["ids"][0], results["documents"][0]
+
+
+def _buscar_lexica(coleccion, pregunta, n):
+    indice = indice_para(coleccion)
+    return indice, indice.buscar(pregunta, n)
+
+
+def _es_confiable(resultados):
+    if not resultados or resultados[0][2] < LEXICAL_EARLY_EXIT_COVERAGE:
+        return False
+    return len(resultados) == 1 or resultados[0][1] >= resultados[1][1] * LEXICAL_EARLY_EXIT_MARGIN
+
+
+def fusionar_rrf(*rankings, k=RRF_K):
+    """
+    Reciprocal rank fusion: cada id suma 1 / (k + posición) por ranking en el que aparece.
+    Retorna los ids ordenados por puntaje; los empates conservan el orden del primer ranking.
+    """
+    puntajes = {}
+    for ranking in rankings:
+        for posicion, id_ in enumerate(ranking, start=1):
+            puntajes[id_] = puntajes.get(id_, 0.0) + 1 / (k + posicion)
+    return sorted(puntajes, key=puntajes.get, reverse=True)
+
+
+def _registrar(ruta, inicio):
+    with _lock:
+        _contadores[ruta] += 1
+        _latencias[ruta].append((time.perf_counter() - inicio) * 1000)
+
+
+def recuperar_documentos(pregunta, top_k=3, coleccion=None, modo=None):
+    """
+    Consulta la colección según `modo` (por defecto RETRIEVAL_MODE).
+    Retorna (ids, documentos) ordenados por relevancia.
+    """
+    coleccion = coleccion if coleccion is not None else get_coleccion()
+    modo = modo or RETRIEVAL_MODE
+    inicio = time.perf_counter()
+
+    if modo == "vector":
+        ids, docs = _buscar_vectorial(coleccion, pregunta, top_k)
+        _registrar("vectorial", inicio)
+        return ids, docs
+
+    indice, lexicos = _buscar_lexica(coleccion, pregunta, max(top_k, RETRIEVAL_CANDIDATES))
+    if modo == "lexical" or _es_confiable(lexicos):
+        lexicos = lexicos[:top_k]
+        _registrar("lexica" if modo == "lexical" else "lexica_rapida", inicio)
+        return [indice.ids[n] for n, _, _ in lexicos], [indice.documentos[n] for n, _, _ in lexicos]
+
+    ids_vec, docs_vec = _buscar_vectorial(coleccion, pregunta, max(top_k, RETRIEVAL_CANDIDATES))
+    textos = dict(zip(ids_vec, docs_vec))
+    textos.update((indice.ids[n], indice.documentos[n]) for n, _, _ in lexicos)
+    # El ranking léxico va primero: ante empate gana la coincidencia exacta de términos
+    ids = fusionar_rrf([indice.ids[n] for n, _, _ in lexicos], ids_vec)[:top_k]
+    _registrar("hibrida", inicio)
+    return ids, [textos[i] for i in ids]
+
+
+def estadisticas():
+    with _lock:
+        resultado = {"modo": RETRIEVAL_MODE}
+        for ruta, cantidad in _contadores.items():
+            latencias = sorted(_latencias[ruta])
+            resultado[ruta] = {
+                "consultas": cantidad,
+                "latencia_ms_p50": round(latencias[len(latencias) // 2], 2) if latencias else None,
+            }
+        return resultado
@@ -0,0 +1,140 @@
+# app/semantic_cache.py
+import hashlib
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from app.intent_engine import normalizar
+from app.embeddings import get_embedder, nombre_coleccion
+
+load_dotenv()
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Distancia coseno máxima para considerar que dos preguntas son la misma
+SEMANTIC_CACHE_MAX_DISTANCE = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.15"))
+SEMANTIC_CACHE_MAX_AGE_SECONDS = int(os.getenv("SEMANTIC_CACHE_MAX_AGE_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+# Intenciones cuyas respuestas dependen de datos personales y nunca se reutilizan
+SEMANTIC_CACHE_DISABLED_INTENTS = {
+    i.strip() for i in os.getenv(
+        "SEMANTIC_CACHE_DISABLED_INTENTS", "agendar_cita,cancelar_cita,reprogramar_cita"
+    ).split(",") if i.strip()
+}
+
+
+class SemanticCache:
+    """
+    Caché de respuestas por similitud: guarda cada pregunta respondida con su
+    embedding en una colección propia de Chroma y reutiliza la respuesta
+    cuando una pregunta nueva queda dentro del umbral de distancia.
+    """
+
+    def __init__(self, chroma_client, nombre="cache_respuestas",
+                 max_distancia=SEMANTIC_CACHE_MAX_DISTANCE,
+                 max_edad=SEMANTIC_CACHE_MAX_AGE_SECONDS,
+                 max_entradas=SEMANTIC_CACHE_MAX_ENTRIES,
+                 intenciones_excluidas=SEMANTIC_CACHE_DISABLED_INTENTS):
+        self._coleccion = chroma_client.get_or_create_collection(
+            name=nombre_coleccion(nombre), metadata={"hnsw:space": "cosine"}
+        )
+        self.max_distancia = max_distancia
+        self.max_edad = max_edad
+        self.max_entradas = max_entradas
+        self.intenciones_excluidas = set(intenciones_excluidas)
+        self._guardadas = 0
+        self.hits = 0
+        self.misses = 0
+
+    def habilitado_para(self, intencion):
+        return intencion not in self.intenciones_excluidas
+
+    def buscar(self, pregunta):
+        """
+        Retorna la respuesta de la pregunta más parecida o None.
+        """
+        if self._coleccion.count() == 0:
+            self.misses += 1
+            return None
+        results = self._coleccion.query(
+            query_embeddings=get_embedder().embeber([pregunta]),
+            n_results=1,
+            include=["metadatas", "distances"]
+        )
+        if results["ids"][0]:
+            distancia = results["distances"][0][0]
+            metadata = results["metadatas"][0][0]
+            vigente = metadata.get("creado", 0) >= time.time() - self.max_edad
+            if distancia <= self.max_distancia and vigente:
+                self.hits += 1
+                return metadata["respuesta"]
+        self.misses += 1
+        return None
+
+    def guardar(self, pregunta, respuesta):
+        clave = hashlib.sha256(normalizar(pregunta).encode("utf-8")).hexdigest()
+        self._coleccion.upsert(
+            ids=[clave],
+            documents=[pregunta],
+            metadatas=[{"respuesta": respuesta, "creado": time.time()}],
+            embeddings=get_embedder().embeber([pregunta])
+        )
+        self._guardadas += 1
+        # Podar de vez en cuando en lugar de en cada escritura
+        if self._guardadas % 100 == 0:
+            self.podar()
+
+    def podar(self) -> int:
+        """
+        Elimina entradas más viejas que max_edad y, si aún sobran, las más antiguas.
+        """
+        limite = time.time() - self.max_edad
+        vencidas = self._coleccion.get(where={"creado": {"$lt": limite}}, include=[])["ids"]
+        if vencidas:
+            self._coleccion.delete(ids=vencidas)
+        sobrantes = self._coleccion.count() - self.max_entradas
+        if sobrantes > 0:
+            todas = self._coleccion.get(include=["metadatas"])
+            por_edad = sorted(zip(todas["ids"], todas["metadatas"]), key=lambda e: e[1].get("creado", 0))
+            self._coleccion.delete(ids=[i for i, _ in por_edad[:sobrantes]])
+        else:
+            sobrantes = 0
+        return len(vencidas) + sobrantes
+
+    def invalidar_todo(self):
+        ids = self._coleccion.get(include=[])["ids"]
+        if ids:
+            self._coleccion.delete(ids=ids)
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """
+    Retorna la caché semántica sobre el cliente de Chroma de la app, o None si está desactivada.
+    """
+    global _cache
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if _cache is not None:
+        return _cache
+    with _cache_lock:
+        if _cache is None:
+            from app.my_collections import get_chroma_client
+
+            _cache = SemanticCache(get_chroma_client())
+    return _cache
+
+
+def estadisticas():
+    # No crea la caché: /metrics no debe abrir Chroma ni cargar el embedder
+    return _cache.estadisticas() if _cache is not None else None
@@ -0,0 +1,278 @@
+# app/state_store.py
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Backend del estado de conversación: memory | sql | redis
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))
+CONVERSATION_MAX_ENTRIES = int(os.getenv("CONVERSATION_MAX_ENTRIES", "10000"))
+CONVERSATION_SWEEP_SECONDS = int(os.getenv("CONVERSATION_SWEEP_SECONDS", "60"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Espera máxima para tomar el lock de un número antes de abandonar el turno
+CONVERSATION_LOCK_WAIT = int(os.getenv("CONVERSATION_LOCK_WAIT", "30"))
+# TTL del lock en Redis; se renueva cada TTL/3 mientras dura el turno
+CONVERSATION_LOCK_TTL = int(os.getenv("CONVERSATION_LOCK_TTL", "60"))
+
+
+class _LocksPorClave:
+    """
+    Conjunto fijo de locks repartidos por hash de la clave.
+    Mantiene la memoria acotada sin importar cuántos números escriban.
+    """
+
+    def __init__(self, n=64):
+        self._locks = [threading.RLock() for _ in range(n)]
+
+    def __call__(self, key):
+        return self._locks[zlib.crc32(key.encode("utf-8")) % len(self._locks)]
+
+
+class MemoryStateStore:
+    """
+    Estado en memoria del proceso, con expiración por inactividad y límite LRU.
+    """
+
+    def __init__(self, ttl=CONVERSATION_TTL_SECONDS, max_entradas=CONVERSATION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # key -> (expira_en, estado)
+        self._mutex = threading.Lock()
+        self._locks = _LocksPorClave()
+
+    @contextmanager
+    def lock(self, key):
+        with self._locks(key):
+            yield
+
+    def get(self, key):
+        with self._mutex:
+            entrada = self._datos.get(key)
+            if entrada is None:
+                return None
+            expira_en, estado = entrada
+            if expira_en < time.monotonic():
+                del self._datos[key]
+                return None
+            self._datos.move_to_end(key)
+            return json.loads(estado)
+
+    def set(self, key, estado):
+        with self._mutex:
+            self._datos[key] = (time.monotonic() + self.ttl, json.dumps(estado))
+            self._datos.move_to_end(key)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def delete(self, key):
+        with self._mutex:
+            self._datos.pop(key, None)
+
+    def sweep(self) -> int:
+        ahora = time.monotonic()
+        with self._mutex:
+            vencidas = [k for k, (expira_en, _) in self._datos.items() if expira_en < ahora]
+            for k in vencidas:
+                del self._datos[k]
+        return len(vencidas)
+
+
+class SQLStateStore:
+    """
+    Estado persistido en la tabla conversation_states usando el `db` de la app.
+    Compartido entre workers; el lock por número usa locks consultivos de la base
+    cuando el motor los soporta (MySQL, PostgreSQL).
+    """
+
+    def __init__(self, ttl=CONVERSATION_TTL_SECONDS):
+        self.ttl = ttl
+        self._locks = _LocksPorClave()
+
+    @contextmanager
+    def lock(self, key, timeout=CONVERSATION_LOCK_WAIT):
+        from app import db
+        from sqlalchemy import text
+
+        with self._locks(key):
+            dialecto = db.engine.dialect.name
+            if dialecto not in ("mysql", "postgresql"):
+                yield
+                return
+            nombre = f"conv:{key}"
+            with db.engine.connect() as conn:
+                if dialecto == "mysql":
+                    # GET_LOCK retorna 1 si lo tomó, 0 si venció la espera y NULL ante un error
+                    tomado = conn.execute(text("SELECT GET_LOCK(:n, :t)"), {"n": nombre, "t": timeout}).scalar() == 1
+                else:
+                    limite = time.monotonic() + timeout
+                    while True:
+                        tomado = conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:n))"), {"n": nombre}).scalar()
+                        if tomado or time.monotonic() >= limite:
+                            break
+                        time.sleep(0.1)
+                if not tomado:
+                    raise TimeoutError(f"No se pudo tomar el lock de {key} en {timeout} s")
+                try:
+                    yield
+                finally:
+                    if dialecto == "mysql":
+                        conn.execute(text("SELECT RELEASE_LOCK(:n)"), {"n": nombre})
+                    else:
+                        conn.execute(text("SELECT pg_advisory_unlock(hashtext(:n))"), {"n": nombre})
+
+    def _limite(self):
+        return datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+
+    def get(self, key):
+        from app.models import ConversationState
+
+        fila = ConversationState.query.filter(
+            ConversationState.from_number == key,
+            ConversationState.updated_at >= self._limite()
+        ).first()
+        return json.loads(fila.data) if fila else None
+
+    def set(self, key, estado):
+        from app import db
+        from app.models import ConversationState
+
+        db.session.merge(ConversationState(
+            from_number=key,
+            data=json.dumps(estado),
+            updated_at=datetime.now(timezone.utc)
+        ))
+        db.session.commit()
+
+    def delete(self, key):
+        from app import db
+        from app.models import ConversationState
+
+        ConversationState.query.filter_by(from_number=key).delete()
+        db.session.commit()
+
+    def sweep(self) -> int:
+        from app import db
+        from app.models import ConversationState
+
+        borradas = ConversationState.query.filter(
+            ConversationState.updated_at < self._limite()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return borradas
+
+
+class RedisStateStore:
+    """
+    Estado en un servidor compatible con el protocolo Redis (Redis, Valkey, KeyDB).
+    La expiración la hace el propio servidor con el TTL de cada clave.
+    """
+
+    def __init__(self, url=REDIS_URL, ttl=CONVERSATION_TTL_SECONDS, prefijo="conv:"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefijo = prefijo
+
+    @contextmanager
+    def lock(self, key, timeout=CONVERSATION_LOCK_WAIT, ttl=CONVERSATION_LOCK_TTL):
+        """
+        Lock distribuido por número. Un turno puede durar más que el TTL (varias llamadas
+        al LLM con reintentos), así que un hilo lo renueva mientras el turno sigue activo.
+        """
+        from redis.exceptions import LockError
+
+        lock = self._redis.lock(f"{self.prefijo}{key}:lock", timeout=ttl, blocking_timeout=timeout)
+        if not lock.acquire():
+            raise TimeoutError(f"No se pudo tomar el lock de {key} en {timeout} s")
+        terminado = threading.Event()
+
+        def renovar():
+            while not terminado.wait(ttl / 3):
+                try:
+                    lock.reacquire()
+                except LockError as e:
+                    print(f"[ERROR] Lock de {key} perdido durante el turno: {e}")
+                    return
+
+        threading.Thread(target=renovar, name=f"lock-{key}", daemon=True).start()
+        try:
+            yield
+        finally:
+            terminado.set()
+            try:
+                lock.release()
+            except LockError as e:
+                # El estado ya se escribió: fallar aquí solo haría repetir el turno
+                print(f"[ERROR] No se pudo liberar el lock de {key}: {e}")
+
+    def get(self, key):
+        valor = self._redis.get(f"{self.prefijo}{key}")
+        return json.loads(valor) if valor else None
+
+    def set(self, key, estado):
+        self._redis.set(f"{self.prefijo}{key}", json.dumps(estado), ex=self.ttl)
+
+    def delete(self, key):
+        self._redis.delete(f"{self.prefijo}{key}")
+
+    def sweep(self) -> int:
+        # Redis expira las claves por su cuenta
+        return 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def iniciar_sweeper(store, app=None, intervalo=CONVERSATION_SWEEP_SECONDS, nombre="conversation-sweeper"):
+    """
+    Lanza un hilo que llama periódicamente a store.sweep() para eliminar entradas vencidas.
+    """
+    def barrer():
+        while True:
+            time.sleep(intervalo)
+            try:
+                if app is not None:
+                    with app.app_context():
+                        borradas = store.sweep()
+                else:
+                    borradas = store.sweep()
+                if borradas:
+                    print(f"[INFO] {nombre}: {borradas} entradas expiradas eliminadas")
+            except Exception as e:
+                print(f"[ERROR] {nombre}: {e}")
+
+    threading.Thread(target=barrer, name=nombre, daemon=True).start()
+
+
+def get_state_store():
+    """
+    Retorna el store configurado en CONVERSATION_STORE, creándolo en el primer uso.
+    """
+    global _store
+    if _store is not None:
+        return _store
+    with _store_lock:
+        if _store is None:
+            from flask import current_app, has_app_context
+
+            if CONVERSATION_STORE == "sql":
+                store = SQLStateStore()
+            elif CONVERSATION_STORE == "redis":
+                store = RedisStateStore()
+            else:
+                store = MemoryStateStore()
+            if not isinstance(store, RedisStateStore):
+                app = current_app._get_current_object() if has_app_context() else None
+                iniciar_sweeper(store, app)
+            _store = store
+    return _store
@@ -0,0 +1,76 @@
+# app/worker_pool.py
+import os
+import queue
+import threading
+from flask import current_app, has_app_context
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Si está activo, el webhook responde 200 de inmediato y el turno se procesa en segundo plano
+WHATSAPP_ASYNC = os.getenv("WHATSAPP_ASYNC", "false").lower() in ("1", "true", "yes")
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "4"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "100"))
+
+
+class WorkerPool:
+    """
+    Pool acotado de hilos que procesa tareas fuera del ciclo de la petición.
+    Cuando la cola está llena, submit() retorna False para aplicar backpressure.
+    """
+
+    def __init__(self, num_workers=WORKER_POOL_SIZE, max_cola=WORKER_QUEUE_SIZE):
+        self.num_workers = num_workers
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilos = []
+        self._lock = threading.Lock()
+        self.procesadas = 0
+        self.rechazadas = 0
+        self.fallidas = 0
+
+    def _iniciar(self):
+        # Los hilos se crean con la primera tarea para no pagar el costo al importar
+        with self._lock:
+            if self._hilos:
+                return
+            for i in range(self.num_workers):
+                hilo = threading.Thread(target=self._trabajar, name=f"worker-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+
+    def submit(self, fn, *args, **kwargs) -> bool:
+        """
+        Encola una tarea. Retorna False si la cola está llena.
+        La tarea se ejecuta dentro del contexto de la app que la encoló.
+        """
+        self._iniciar()
+        app = current_app._get_current_object() if has_app_context() else None
+        try:
+            self._cola.put_nowait((app, fn, args, kwargs))
+            return True
+        except queue.Full:
+            self.rechazadas += 1
+            return False
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    def _trabajar(self):
+        while True:
+            app, fn, args, kwargs = self._cola.get()
+            try:
+                if app is not None:
+                    with app.app_context():
+                        fn(*args, **kwargs)
+                else:
+                    fn(*args, **kwargs)
+                self.procesadas += 1
+            except Exception as e:
+                self.fallidas += 1
+                print(f"[ERROR] worker {fn.__name__}: {e}")
+            finally:
+                self._cola.task_done()
+
+
+# Pool compartido por los webhooks de WhatsApp
+worker_pool = WorkerPool()
@@ -0,0 +1,35 @@
+"""
+Microbenchmark del parser local de fechas y horas (app/fechas.py).
+
+Mide el tiempo por llamada sobre el corpus de tests/test_fechas.py;
+la corrección se verifica con pytest.
+Uso: python -m benchmarks.bench_fechas [--repeticiones N]
+"""
+import argparse
+import timeit
+
+from app.fechas import parsear_fecha, parsear_hora
+from tests.test_fechas import CASOS_FECHA, CASOS_HORA, HOY
+
+
+def medir(repeticiones):
+    def todas_fechas():
+        for texto, _ in CASOS_FECHA:
+            parsear_fecha(texto, hoy=HOY)
+
+    def todas_horas():
+        for texto, _ in CASOS_HORA:
+            parsear_hora(texto)
+
+    for nombre, fn, casos in (("fecha", todas_fechas, CASOS_FECHA), ("hora", todas_horas, CASOS_HORA)):
+        segundos = min(timeit.repeat(fn, number=repeticiones, repeat=5))
+        por_llamada = segundos / (repeticiones * len(casos)) * 1e6
+        print(f"parsear_{nombre}: {por_llamada:.2f} µs por llamada ({len(casos)} casos x {repeticiones})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeticiones", type=int, default=2000)
+    args = parser.parse_args()
+
+    medir(args.repeticiones)
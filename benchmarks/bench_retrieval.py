@@ -0,0 +1,205 @@
+"""
+Benchmark de recuperación (app/retrieval.py, usado por recuperar_contexto).
+
+Carga los documentos reales de la base de conocimiento en colecciones efímeras
+agrandadas con documentos sintéticos y, para cada tamaño, modo y top_k, mide
+recall@k, MRR y latencia p50/p95/p99 sobre un set fijo de preguntas etiquetadas.
+El resultado es JSON, para comparar corridas con diff.
+
+Uso: python -m benchmarks.bench_retrieval [--tamanos 1000,10000,100000] [--top-k 1,3,5]
+         [--modos hybrid,lexical,vector] [--repeticiones 3] [--salida resultado.json] [--con-cache]
+
+Con corpus grandes conviene EMBEDDING_BACKEND=hashing; con onnx la carga de 100k tarda.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+# Preguntas etiquetadas con los ids que deberían recuperarse
+PREGUNTAS = [
+    ("¿Cuál es el horario de atención?", ["dental_doc_7"]),
+    ("¿Atienden los sábados?", ["dental_doc_7"]),
+    ("¿Dónde queda la clínica?", ["dental_doc_8"]),
+    ("¿Cuál es la dirección de la clínica dental?", ["dental_doc_8"]),
+    ("¿Cuánto dura una limpieza dental?", ["dental_doc_0"]),
+    ("¿Tengo que estar en ayunas para la limpieza?", ["dental_doc_0"]),
+    ("¿Necesito radiografía para una extracción?", ["dental_doc_1"]),
+    ("¿Qué debo evitar antes del blanqueamiento?", ["dental_doc_2"]),
+    ("blanqueamiento", ["dental_doc_2"]),
+    ("¿Qué tengo que llevar a la consulta de ortodoncia?", ["dental_doc_3"]),
+    ("¿Cuándo puedo comer después de un empaste?", ["dental_doc_4"]),
+    ("¿Cuántas visitas requiere una endodoncia?", ["dental_doc_5"]),
+    ("endodoncia", ["dental_doc_5"]),
+    ("¿Cuánto dura la sesión de periodoncia?", ["dental_doc_6"]),
+    ("Tratamiento de encías", ["dental_doc_6"]),
+    ("Tengo una emergencia dental, ¿me atienden hoy?", ["dental_doc_9"]),
+    ("¿A qué número llamo por una urgencia?", ["dental_doc_9"]),
+    ("¿Qué hace Oberoende?", ["doc_0", "doc_4"]),
+    ("¿Tienen chatbots para WhatsApp?", ["doc_0", "doc_4"]),
+    ("¿El chatbot responde preguntas frecuentes?", ["doc_1"]),
+    ("¿Pueden automatizar tareas repetitivas?", ["doc_1"]),
+    ("¿Hacen integraciones con Twilio y APIs REST?", ["doc_2", "doc_0"]),
+    ("¿Para qué sirven los modelos de lenguaje?", ["doc_3"]),
+]
+
+# Vocabulario de los documentos sintéticos: comparte términos con los reales para que compitan
+_VOCABULARIO = (
+    "paciente clínica consulta tratamiento horario cita dental dientes encías control revisión "
+    "seguro pago factura recepción turno doctor doctora sesión minutos semana mes empresa servicio "
+    "cliente soporte mensaje plataforma sistema proceso reporte equipo proyecto contrato plan "
+    "garantía promoción descuento sucursal estacionamiento acceso documento formulario registro "
+    "historial receta medicamento dolor cuidado higiene cepillado hilo enjuague revisión anual"
+).split()
+_PLANTILLAS = (
+    "Información interna {n}: {a} y {b} para el {c}, revisar {d} antes del {e}.",
+    "Nota {n} sobre {a}: el {b} del {c} se coordina con {d} y {e}.",
+    "Procedimiento administrativo {n}: {a}, {b}, {c}; consultar {d} o {e}.",
+    "Aviso {n}: cambios en {a} y {b}; el {c} afecta {d} durante la {e}.",
+)
+
+
+def documentos_sinteticos(cantidad, semilla=42):
+    """
+    Genera `cantidad` documentos de relleno deterministas como (id, texto).
+    """
+    azar = random.Random(semilla)
+    for n in range(cantidad):
+        palabras = azar.sample(_VOCABULARIO, 5)
+        plantilla = _PLANTILLAS[n % len(_PLANTILLAS)]
+        yield f"synthetic_{n}", plantilla.format(n=n, a=palabras[0], b=palabras[1], c=palabras[2],
+                                                 d=palabras[3], e=palabras[4])
+
+
+def documentos_reales():
+    from app.my_collections import documentos, documentos_odontologia
+
+    return (
+        [(f"doc_{i}", d) for i, d in enumerate(documentos)]
+        + [(f"dental_doc_{i}", d) for i, d in enumerate(documentos_odontologia)]
+    )
+
+
+def verificar(reales):
+    ids = {i for i, _ in reales}
+    return [f"{p!r}: id desconocido {e}" for p, esperados in PREGUNTAS for e in esperados if e not in ids]
+
+
+def construir_coleccion(cliente, tamano, lote=1000):
+    """
+    Colección efímera con los documentos reales más relleno sintético hasta `tamano`.
+    """
+    from app.embeddings import get_embedder
+
+    nombre = f"bench_{tamano}"
+    try:
+        cliente.delete_collection(nombre)
+    except Exception:
+        pass
+    coleccion = cliente.create_collection(name=nombre)
+    reales = documentos_reales()
+    pendientes = list(reales)
+    for par in documentos_sinteticos(max(0, tamano - len(reales))):
+        pendientes.append(par)
+        if len(pendientes) >= lote:
+            _agregar(coleccion, pendientes, get_embedder())
+            pendientes = []
+    if pendientes:
+        _agregar(coleccion, pendientes, get_embedder())
+    return coleccion
+
+
+def _agregar(coleccion, pares, embedder):
+    ids, textos = [i for i, _ in pares], [t for _, t in pares]
+    coleccion.add(ids=ids, documents=textos, embeddings=embedder.embeber(textos))
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))], 3)
+
+
+def medir(coleccion, modo, top_k, repeticiones):
+    from app.retrieval import recuperar_documentos
+
+    # Primera llamada fuera de la medición: construye el índice léxico
+    recuperar_documentos(PREGUNTAS[0][0], top_k=top_k, coleccion=coleccion, modo=modo)
+
+    latencias, recalls, reciprocos = [], [], []
+    for pregunta, esperados in PREGUNTAS:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            ids, _ = recuperar_documentos(pregunta, top_k=top_k, coleccion=coleccion, modo=modo)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        recalls.append(len(set(ids[:top_k]) & set(esperados)) / len(esperados))
+        rango = next((n for n, i in enumerate(ids[:top_k], start=1) if i in esperados), None)
+        reciprocos.append(1 / rango if rango else 0.0)
+    return {
+        "recall_at_k": round(sum(recalls) / len(recalls), 4),
+        "mrr": round(sum(reciprocos) / len(reciprocos), 4),
+        "latencia_ms_p50": _percentil(latencias, 0.50),
+        "latencia_ms_p95": _percentil(latencias, 0.95),
+        "latencia_ms_p99": _percentil(latencias, 0.99),
+    }
+
+
+def _lista_enteros(texto):
+    return [int(v) for v in texto.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=_lista_enteros, default=[1000, 10000, 100000])
+    parser.add_argument("--top-k", type=_lista_enteros, default=[1, 3, 5])
+    parser.add_argument("--modos", default="hybrid,lexical,vector")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="archivo JSON; por defecto stdout")
+    parser.add_argument("--con-cache", action="store_true",
+                        help="usar la caché persistente de embeddings (por defecto se mide sin ella)")
+    args = parser.parse_args()
+
+    # Debe fijarse antes de importar app.embeddings
+    if not args.con_cache:
+        os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+    import chromadb
+    from app.embeddings import get_embedder
+
+    reales = documentos_reales()
+    fallos = verificar(reales)
+    for fallo in fallos:
+        print(f"[ERROR] {fallo}", file=sys.stderr)
+    if fallos:
+        sys.exit(1)
+
+    cliente = chromadb.EphemeralClient()
+    resultados = []
+    for tamano in args.tamanos:
+        inicio = time.perf_counter()
+        coleccion = construir_coleccion(cliente, tamano)
+        print(f"[INFO] Colección de {coleccion.count()} documentos en {time.perf_counter() - inicio:.1f} s",
+              file=sys.stderr)
+        for modo in args.modos.split(","):
+            for top_k in args.top_k:
+                resultados.append({
+                    "tamano": tamano, "modo": modo, "top_k": top_k,
+                    **medir(coleccion, modo, top_k, args.repeticiones),
+                })
+                print(f"[INFO] {resultados[-1]}", file=sys.stderr)
+        cliente.delete_collection(coleccion.name)
+
+    salida = json.dumps({
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "backend": get_embedder().nombre,
+        "preguntas": len(PREGUNTAS),
+        "repeticiones": args.repeticiones,
+        "resultados": resultados,
+    }, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(salida + "\n")
+    else:
+        print(salida)
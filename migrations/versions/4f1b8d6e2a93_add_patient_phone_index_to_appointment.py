@@ -0,0 +1,25 @@
+"""Add patient_phone index to appointment
+
+Revision ID: 4f1b8d6e2a93
+Revises: 9a4e7b2c5d18
+Create Date: 2026-10-18 15:48:12.604951
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1b8d6e2a93'
+down_revision = '9a4e7b2c5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.create_index('ix_appointment_patient_phone', ['patient_phone'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_index('ix_appointment_patient_phone')
@@ -0,0 +1,34 @@
+"""Add processed_messages table
+
+Revision ID: 5b9f1c3a7d20
+Revises: e44d605d72e1
+Create Date: 2026-10-18 10:03:17.552190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b9f1c3a7d20'
+down_revision = 'e44d605d72e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('processed_messages',
+    sa.Column('message_sid', sa.String(length=64), nullable=False),
+    sa.Column('resultado', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('message_sid')
+    )
+    with op.batch_alter_table('processed_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_processed_messages_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('processed_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_processed_messages_created_at'))
+
+    op.drop_table('processed_messages')
@@ -0,0 +1,46 @@
+"""Add slot_activo and unique active-slot index to appointment
+
+Revision ID: 9a4e7b2c5d18
+Revises: c3d8e2f41a6b
+Create Date: 2026-10-18 15:02:41.228317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e7b2c5d18'
+down_revision = 'c3d8e2f41a6b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slot_activo', sa.Boolean(), nullable=True))
+
+    appointment = sa.table('appointment', sa.column('id', sa.Integer), sa.column('date', sa.Date),
+                           sa.column('time', sa.Time), sa.column('status', sa.String),
+                           sa.column('slot_activo', sa.Boolean))
+    op.execute(appointment.update().where(appointment.c.status != 'canceled').values(slot_activo=True))
+
+    # El índice único no se puede crear si ya hay horarios tomados dos veces
+    duplicados = op.get_bind().execute(
+        sa.select(appointment.c.date, appointment.c.time, sa.func.count())
+        .where(appointment.c.slot_activo.is_(True))
+        .group_by(appointment.c.date, appointment.c.time)
+        .having(sa.func.count() > 1)
+    ).fetchall()
+    if duplicados:
+        lista = ", ".join(f"{fecha} {hora} ({n})" for fecha, hora, n in duplicados)
+        raise RuntimeError(f"Hay citas activas duplicadas; cancele o reprograme antes de migrar: {lista}")
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.create_index('uq_appointment_slot_activo', ['date', 'time', 'slot_activo'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_index('uq_appointment_slot_activo')
+        batch_op.drop_column('slot_activo')
@@ -0,0 +1,41 @@
+"""Add inbound_messages table
+
+Revision ID: a3d9e6b1c4f8
+Revises: e8c1a7f39b42
+Create Date: 2026-10-18 20:41:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9e6b1c4f8'
+down_revision = 'e8c1a7f39b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('inbound_messages',
+    sa.Column('message_sid', sa.String(length=64), nullable=False),
+    sa.Column('from_number', sa.String(length=64), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('intentos', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('message_sid')
+    )
+    with op.batch_alter_table('inbound_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_inbound_messages_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_inbound_messages_status_updated_at', ['status', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('inbound_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_inbound_messages_status_updated_at')
+        batch_op.drop_index(batch_op.f('ix_inbound_messages_created_at'))
+
+    op.drop_table('inbound_messages')
@@ -0,0 +1,28 @@
+"""Add availability_version table
+
+Revision ID: b7e2c4a91f05
+Revises: 4f1b8d6e2a93
+Create Date: 2026-10-18 16:21:37.310482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c4a91f05'
+down_revision = '4f1b8d6e2a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('availability_version',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('date')
+    )
+
+
+def downgrade():
+    op.drop_table('availability_version')
@@ -0,0 +1,32 @@
+"""Add reminder columns and status/date/time index to appointment
+
+Revision ID: c3d8e2f41a6b
+Revises: 5b9f1c3a7d20
+Create Date: 2026-10-18 12:27:05.913374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8e2f41a6b'
+down_revision = '5b9f1c3a7d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminder_claim', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('reminder_claimed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_appointment_status_date_time', ['status', 'date', 'time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_index('ix_appointment_status_date_time')
+        batch_op.drop_column('reminder_sent_at')
+        batch_op.drop_column('reminder_claimed_at')
+        batch_op.drop_column('reminder_claim')
@@ -0,0 +1,28 @@
+"""Add reminder retry columns to appointment
+
+Revision ID: d5a3f8c61e27
+Revises: b7e2c4a91f05
+Create Date: 2026-10-18 18:04:12.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a3f8c61e27'
+down_revision = 'b7e2c4a91f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminder_attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('reminder_next_attempt_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_column('reminder_next_attempt_at')
+        batch_op.drop_column('reminder_attempts')
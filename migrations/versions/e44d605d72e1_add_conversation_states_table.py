@@ -0,0 +1,34 @@
+"""Add conversation_states table
+
+Revision ID: e44d605d72e1
+Revises: 87c6ffd134fe
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e44d605d72e1'
+down_revision = '87c6ffd134fe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversation_states',
+    sa.Column('from_number', sa.String(length=32), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('from_number')
+    )
+    with op.batch_alter_table('conversation_states', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_conversation_states_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('conversation_states', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_conversation_states_updated_at'))
+
+    op.drop_table('conversation_states')
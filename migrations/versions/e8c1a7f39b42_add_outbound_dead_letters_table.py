@@ -0,0 +1,38 @@
+"""Add outbound_dead_letters table
+
+Revision ID: e8c1a7f39b42
+Revises: d5a3f8c61e27
+Create Date: 2026-10-18 19:12:44.731905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c1a7f39b42'
+down_revision = 'd5a3f8c61e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbound_dead_letters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('to_number', sa.String(length=64), nullable=False),
+    sa.Column('from_number', sa.String(length=64), nullable=True),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbound_dead_letters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_outbound_dead_letters_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outbound_dead_letters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_outbound_dead_letters_created_at'))
+
+    op.drop_table('outbound_dead_letters')
@@ -0,0 +1,30 @@
+import pytest
+from flask import Flask
+from app import csrf, db
+
+
+@pytest.fixture
+def crear_app(tmp_path):
+    """
+    App mínima con SQLite en archivo y solo los blueprints que pide cada test
+    (create_app necesita las credenciales de Google Calendar y MySQL).
+    """
+    def crear(*blueprints):
+        app = Flask("app")
+        app.config.update(
+            TESTING=True,
+            SECRET_KEY="test",
+            WTF_CSRF_ENABLED=False,
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+            # Varios hilos escriben a la vez: esperar el lock de SQLite en lugar de fallar
+            SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 30}},
+        )
+        db.init_app(app)
+        csrf.init_app(app)
+        for bp in blueprints:
+            app.register_blueprint(bp)
+        with app.app_context():
+            db.create_all()
+        return app
+
+    return crear
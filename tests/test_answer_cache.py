@@ -0,0 +1,13 @@
+from app.answer_cache import clave_respuesta
+
+
+def test_editar_un_documento_cambia_la_clave():
+    ids = ["doc_0", "dental_doc_7"]
+    antes = clave_respuesta("¿Cuál es el horario?", ids, ["Oberoende...", "Horario: Lunes a Viernes 9:00-19:00"])
+    despues = clave_respuesta("¿Cuál es el horario?", ids, ["Oberoende...", "Horario: Lunes a Viernes 9:00-18:00"])
+    assert antes != despues
+
+
+def test_misma_pregunta_normalizada_y_documentos_comparten_clave():
+    ids, docs = ["a", "b"], ["uno", "dos"]
+    assert clave_respuesta("¿Cuál es el HORARIO?", ids, docs) == clave_respuesta("cual es el horario", ids[::-1], docs[::-1])
@@ -0,0 +1,72 @@
+import threading
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.appointments import bp, es_choque_de_horario
+from app.models import Appointment, db
+
+
+def _reservar(client, fecha, hora="10:00:00", nombre="Paciente"):
+    return client.post("/appointments/appointments", json={
+        "name": nombre, "phone": "+51999999999", "service": "Limpieza",
+        "date": fecha, "time": hora,
+    })
+
+
+def test_reservas_paralelas_del_mismo_horario(crear_app):
+    app = crear_app(bp)
+    fecha = (date.today() + timedelta(days=7)).isoformat()
+    n = 20
+    barrera = threading.Barrier(n)
+    codigos = []
+
+    def reservar(i):
+        with app.test_client() as client:
+            barrera.wait()
+            codigos.append(_reservar(client, fecha, nombre=f"Paciente {i}").status_code)
+
+    hilos = [threading.Thread(target=reservar, args=(i,)) for i in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sorted(codigos) == [201] + [409] * (n - 1)
+
+
+def test_cancelar_libera_el_horario(crear_app):
+    app = crear_app(bp)
+    fecha = (date.today() + timedelta(days=7)).isoformat()
+    client = app.test_client()
+
+    primera = _reservar(client, fecha)
+    assert primera.status_code == 201
+    assert _reservar(client, fecha).status_code == 409
+
+    cita_id = primera.get_json()["appointment_id"]
+    assert client.put(f"/appointments/appointments/{cita_id}", json={"status": "canceled"}).status_code == 200
+    assert _reservar(client, fecha).status_code == 201
+    # Reactivar la cancelada chocaría con la nueva reserva
+    assert client.put(f"/appointments/appointments/{cita_id}", json={"status": "pending"}).status_code == 409
+
+
+def test_solo_el_indice_de_horarios_es_conflicto(crear_app):
+    app = crear_app(bp)
+    fecha = date.today() + timedelta(days=7)
+    with app.app_context():
+        db.session.add(Appointment(patient_name="A", patient_phone="1", service_type="x", date=fecha, time=time(10)))
+        db.session.commit()
+
+        db.session.add(Appointment(patient_name="B", patient_phone="2", service_type="x", date=fecha, time=time(10)))
+        with pytest.raises(IntegrityError) as choque:
+            db.session.commit()
+        db.session.rollback()
+        assert es_choque_de_horario(choque.value)
+
+        db.session.add(Appointment(patient_name=None, patient_phone="3", service_type="x", date=fecha, time=time(11)))
+        with pytest.raises(IntegrityError) as nulo:
+            db.session.commit()
+        db.session.rollback()
+        assert not es_choque_de_horario(nulo.value)
@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from app.fechas import parsear_fecha, parsear_hora
+
+# Jueves 2025-11-13 como referencia fija para las fechas relativas
+HOY = date(2025, 11, 13)
+
+CASOS_FECHA = [
+    ("hoy", "2025-11-13"),
+    ("mañana", "2025-11-14"),
+    ("Mañana a las 3pm", "2025-11-14"),
+    ("pasado mañana", "2025-11-15"),
+    ("el lunes", "2025-11-17"),
+    ("el próximo jueves", "2025-11-20"),
+    ("sábado", "2025-11-15"),
+    ("15 de diciembre", "2025-12-15"),
+    ("15 diciembre", "2025-12-15"),
+    ("3 de enero", "2026-01-03"),
+    ("10 de noviembre", "2026-11-10"),
+    ("1 de marzo de 2026", "2026-03-01"),
+    ("15/12", "2025-12-15"),
+    ("15/12/2025", "2025-12-15"),
+    ("2025-12-01", "2025-12-01"),
+    ("en 3 días", "2025-11-16"),
+    ("dentro de dos semanas", "2025-11-27"),
+    ("31 de febrero", None),
+    ("cuando puedas", None),
+    ("10 de la mañana", None),
+]
+
+CASOS_HORA = [
+    ("3pm", "15:00"),
+    ("3 pm", "15:00"),
+    ("3 p.m.", "15:00"),
+    ("10am", "10:00"),
+    ("12 pm", "12:00"),
+    ("15:00", "15:00"),
+    ("9:30", "09:30"),
+    ("3:30 pm", "15:30"),
+    ("15h", "15:00"),
+    ("3 de la tarde", "15:00"),
+    ("8 de la noche", "20:00"),
+    ("10 de la mañana", "10:00"),
+    ("3 y media", "15:30"),
+    ("las 3", "15:00"),
+    ("3", "15:00"),
+    ("3:30", "15:30"),
+    ("1 menos cuarto", "12:45"),
+    ("07:00", "07:00"),
+    ("7 de la mañana", "07:00"),
+    ("5 am", "05:00"),
+    ("3 y media de la tarde", "15:30"),
+    ("a las 10 y cuarto", "10:15"),
+    ("a las 4 menos cuarto", "15:45"),
+    ("a las tres y media", "15:30"),
+    ("a las 3", "15:00"),
+    ("mediodía", "12:00"),
+    ("el 15 de diciembre a las 11", "11:00"),
+    ("25:00", None),
+    ("3 personas", None),
+    ("hora 3", None),
+    ("somos 2 para la limpieza", None),
+    ("cuando puedas", None),
+]
+
+
+@pytest.mark.parametrize("texto, esperado", CASOS_FECHA)
+def test_parsear_fecha(texto, esperado):
+    assert parsear_fecha(texto, hoy=HOY) == esperado
+
+
+@pytest.mark.parametrize("texto, esperado", CASOS_HORA)
+def test_parsear_hora(texto, esperado):
+    assert parsear_hora(texto) == esperado
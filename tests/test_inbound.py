@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.whatsapp as whatsapp
+from app import db, inbound
+from app.models import InboundMessage
+
+
+class PoolEspia:
+    """Pool que solo guarda las tareas, como si el proceso cayera antes de ejecutarlas."""
+
+    def __init__(self):
+        self.tareas = []
+
+    def submit(self, fn, *args):
+        self.tareas.append((fn, args))
+        return True
+
+    def ejecutar(self):
+        tareas, self.tareas = self.tareas, []
+        for fn, args in tareas:
+            fn(*args)
+
+
+@pytest.fixture
+def app_async(crear_app, monkeypatch):
+    from app.users import Usuario  # noqa: F401  (registra la tabla usuarios)
+
+    pool = PoolEspia()
+    monkeypatch.setattr(whatsapp, "WHATSAPP_ASYNC", True)
+    monkeypatch.setattr(whatsapp, "worker_pool", pool)
+    monkeypatch.setattr(inbound, "worker_pool", pool)
+    monkeypatch.setattr(whatsapp, "resolver_turno", lambda from_number, body: f"eco: {body}")
+    app = crear_app(whatsapp.bp)
+    app.pool = pool
+    return app
+
+
+def _envejecer(segundos):
+    InboundMessage.query.update({"updated_at": datetime.now(timezone.utc) - timedelta(seconds=segundos)})
+    db.session.commit()
+
+
+def test_mensaje_confirmado_y_perdido_se_reentrega(app_async, monkeypatch):
+    enviados = []
+    monkeypatch.setattr(whatsapp, "enviar_whatsapp", lambda to_number, body_text: enviados.append(body_text))
+    cliente = app_async.test_client()
+    datos = {"From": "whatsapp:+51900000001", "Body": "hola", "MessageSid": "SM-perdido"}
+    assert cliente.post("/whatsapp_webhook", data=datos).status_code == 200
+
+    with app_async.app_context():
+        assert db.session.get(InboundMessage, "SM-perdido").status == "pendiente"
+        app_async.pool.tareas.clear()  # el proceso cae antes de que un worker lo tome
+
+        assert inbound.reentregar(whatsapp.procesar_mensaje) == 0  # todavía dentro del margen
+        _envejecer(inbound.INBOUND_REDELIVER_AFTER_SECONDS + 1)
+        assert inbound.reentregar(whatsapp.procesar_mensaje) == 1
+        app_async.pool.ejecutar()
+
+        fila = db.session.get(InboundMessage, "SM-perdido")
+        assert (fila.status, fila.intentos) == ("completado", 1)
+        assert enviados == ["eco: hola"]
+        _envejecer(inbound.INBOUND_REDELIVER_AFTER_SECONDS + 1)
+        assert inbound.reentregar(whatsapp.procesar_mensaje) == 0
+
+
+def test_turno_fallido_se_reintenta_hasta_el_maximo(app_async, monkeypatch):
+    def enviar_caido(to_number, body_text):
+        raise RuntimeError("twilio caído")
+
+    monkeypatch.setattr(whatsapp, "enviar_whatsapp", enviar_caido)
+    cliente = app_async.test_client()
+    cliente.post("/whatsapp_webhook", data={"From": "whatsapp:+51900000002", "Body": "hola", "MessageSid": "SM-falla"})
+
+    with app_async.app_context():
+        for _ in range(inbound.INBOUND_MAX_ATTEMPTS):
+            with pytest.raises(RuntimeError):
+                app_async.pool.ejecutar()
+            _envejecer(inbound.INBOUND_REDELIVER_AFTER_SECONDS + 1)
+            inbound.reentregar(whatsapp.procesar_mensaje)
+
+        fila = db.session.get(InboundMessage, "SM-falla")
+        assert (fila.status, fila.intentos, fila.error) == ("fallido", inbound.INBOUND_MAX_ATTEMPTS, "twilio caído")
+        assert app_async.pool.tareas == []
+
+
+def test_pool_lleno_no_deja_el_mensaje_guardado(app_async):
+    app_async.pool.submit = lambda fn, *args: False
+    cliente = app_async.test_client()
+    respuesta = cliente.post("/whatsapp_webhook",
+                             data={"From": "whatsapp:+51900000003", "Body": "hola", "MessageSid": "SM-lleno"})
+    assert respuesta.status_code == 503
+    with app_async.app_context():
+        assert db.session.get(InboundMessage, "SM-lleno") is None
@@ -0,0 +1,57 @@
+import uuid
+
+import chromadb
+import pytest
+
+from app import my_collections
+from app.ingestion import ingerir_directorio
+
+
+class EmbedderEspia:
+    def __init__(self):
+        self.llamadas = 0
+
+    def embeber(self, textos):
+        self.llamadas += 1
+        return [[float(len(t)), 1.0] for t in textos]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    espia = EmbedderEspia()
+    monkeypatch.setattr(my_collections, "get_embedder", lambda: espia)
+    return espia
+
+
+@pytest.fixture
+def coleccion():
+    return chromadb.EphemeralClient().get_or_create_collection(f"prueba_{uuid.uuid4().hex[:8]}")
+
+
+def _escribir(directorio, archivos):
+    for nombre, texto in archivos.items():
+        (directorio / nombre).write_text(texto, encoding="utf-8")
+
+
+def test_el_lote_se_comparte_entre_archivos(tmp_path, coleccion, embedder):
+    _escribir(tmp_path, {f"nota{i}.md": f"Contenido de la nota {i}." for i in range(5)})
+    totales = ingerir_directorio(tmp_path, coleccion, lote=64, progreso=None)
+    assert totales["embebidos"] == 5
+    assert embedder.llamadas == 1
+
+
+def test_fragmentos_sobrantes_se_podan_en_una_sola_pasada(tmp_path, coleccion, embedder, monkeypatch):
+    parrafos = "\n\n".join(f"Párrafo {i} " + "x" * 40 for i in range(4))
+    _escribir(tmp_path, {"largo.md": parrafos, "corto.md": "Una sola línea."})
+    ingerir_directorio(tmp_path, coleccion, tamano=60, solapamiento=10, progreso=None)
+    antes = coleccion.count()
+
+    _escribir(tmp_path, {"largo.md": "Párrafo 0 " + "x" * 40})
+    consultas = []
+    get_original = coleccion.get
+    monkeypatch.setattr(coleccion, "get", lambda **kw: consultas.append(kw.get("where")) or get_original(**kw))
+    totales = ingerir_directorio(tmp_path, coleccion, tamano=60, solapamiento=10, progreso=None)
+
+    assert totales["borrados"] == antes - 2
+    assert sorted(m["fuente"] for m in coleccion.get(include=["metadatas"])["metadatas"]) == ["corto.md", "largo.md"]
+    assert [w for w in consultas if w] == [{"fuente": {"$in": ["corto.md", "largo.md"]}}]
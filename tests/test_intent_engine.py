@@ -0,0 +1,41 @@
+import pytest
+
+from app.intent_engine import INTENT_FAST_PATH_THRESHOLD, clasificar, detectar_con_ruta_rapida
+
+
+@pytest.mark.parametrize("mensaje, intencion", [
+    ("Quiero cancelar mi cita", "cancelar_cita"),
+    ("anula la reserva del martes por favor", "cancelar_cita"),
+    ("ya no puedo ir mañana", "cancelar_cita"),
+    ("necesito reprogramar mi cita", "reprogramar_cita"),
+    ("quiero cambiar la consulta para otro día", "reprogramar_cita"),
+    ("quiero agendar una cita", "agendar_cita"),
+    ("hola", "consulta_general"),
+])
+def test_ruta_rapida(mensaje, intencion):
+    resultado = clasificar(mensaje)
+    assert resultado.intencion == intencion
+    assert resultado.confianza >= INTENT_FAST_PATH_THRESHOLD
+
+
+@pytest.mark.parametrize("mensaje", [
+    "¿puedo cancelar sin costo?",
+    "¿cuánto cuesta anular?",
+    "¿qué pasa si llego tarde a la consulta?",
+    "¿qué pasa si cancelo la cita?",
+    "¿se puede reprogramar?",
+    "cancelar",
+    "¿Puedo pasar la cita a la tarde?",
+])
+def test_preguntas_no_disparan_cancelar_ni_reprogramar(mensaje):
+    llamadas = []
+
+    def detectar_llm(texto):
+        llamadas.append(texto)
+        return {"intencion": "consulta_general", "entidades": {}}
+
+    resultado = detectar_con_ruta_rapida(mensaje, detectar_llm)
+    # O se responde como consulta general, o se deja la decisión al LLM
+    assert resultado["intencion"] not in ("cancelar_cita", "reprogramar_cita")
+    if clasificar(mensaje).intencion in ("cancelar_cita", "reprogramar_cita"):
+        assert llamadas == [mensaje]
@@ -0,0 +1,44 @@
+import uuid
+
+import chromadb
+import pytest
+
+from app import my_collections
+from app.my_collections import id_documento, sincronizar_documentos
+
+
+class EmbedderFalso:
+    def embeber(self, textos):
+        return [[float(len(t)), 1.0] for t in textos]
+
+
+@pytest.fixture
+def coleccion(monkeypatch):
+    monkeypatch.setattr(my_collections, "get_embedder", lambda: EmbedderFalso())
+    return chromadb.EphemeralClient().get_or_create_collection(f"prueba_{uuid.uuid4().hex[:8]}")
+
+
+def _sincronizar(coleccion, textos, origen="documentos"):
+    return sincronizar_documentos(coleccion, textos, [id_documento("doc", t) for t in textos], origen=origen)
+
+
+def test_quitar_un_documento_lo_borra_de_la_coleccion(coleccion):
+    _sincronizar(coleccion, ["horario", "ubicacion", "precios"])
+    assert _sincronizar(coleccion, ["horario", "precios"]) == 0
+    assert sorted(coleccion.get()["documents"]) == ["horario", "precios"]
+
+
+def test_reordenar_no_reembebe_ni_cambia_ids(coleccion):
+    _sincronizar(coleccion, ["horario", "ubicacion"])
+    ids = sorted(coleccion.get()["ids"])
+    assert _sincronizar(coleccion, ["ubicacion", "horario"]) == 0
+    assert sorted(coleccion.get()["ids"]) == ids
+
+
+def test_la_poda_respeta_otros_origenes_y_fragmentos_ingeridos(coleccion):
+    _sincronizar(coleccion, ["horario"], origen="documentos")
+    _sincronizar(coleccion, ["limpieza"], origen="documentos_odontologia")
+    sincronizar_documentos(coleccion, ["manual"], ["manual.md#0"], [{"fuente": "manual.md"}])
+
+    _sincronizar(coleccion, [], origen="documentos")
+    assert sorted(coleccion.get()["documents"]) == ["limpieza", "manual"]
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+
+import pytest
+
+from app import outbound
+from app.models import OutboundDeadLetter
+from app.outbound import OutboundDispatcher
+
+
+class TwilioEspia:
+    def __init__(self, error=None):
+        self.enviados = []
+        self.error = error
+        self.messages = self
+
+    def create(self, from_, to, body):
+        if self.error is not None:
+            raise self.error
+        self.enviados.append((from_, to, body))
+        return SimpleNamespace(sid=f"SM{len(self.enviados)}")
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    espia = TwilioEspia()
+    monkeypatch.setattr(outbound, "get_twilio_client", lambda: espia)
+    return espia
+
+
+def test_envio_en_espera_del_bucket_se_cancela_al_vencer_el_timeout(twilio):
+    dispatcher = OutboundDispatcher(max_en_vuelo=1, tasa=1, rafaga=1)
+    assert dispatcher.enviar_y_esperar("+1", "primero", from_="+100", timeout=5) == "SM1"
+
+    with pytest.raises(FutureTimeoutError):
+        dispatcher.enviar_y_esperar("+1", "segundo", from_="+100", timeout=0.1)
+    time.sleep(1.2)
+    assert [body for _, _, body in twilio.enviados] == ["primero"]
+
+
+def test_la_espera_de_un_remitente_no_bloquea_a_los_demas(twilio):
+    dispatcher = OutboundDispatcher(max_en_vuelo=1, tasa=1, rafaga=1)
+    dispatcher.enviar_y_esperar("+1", "a", from_="+100", timeout=5)
+    demorado = dispatcher.enviar("+1", "b", from_="+100")
+
+    # Con un solo worker, el otro remitente sale mientras "b" espera su token
+    assert dispatcher.enviar_y_esperar("+2", "c", from_="+200", timeout=0.5) == "SM2"
+    assert demorado.result(timeout=5) == "SM3"
+
+
+def test_envio_descartado_queda_en_la_base(crear_app, monkeypatch):
+    monkeypatch.setattr(outbound, "get_twilio_client", lambda: TwilioEspia(ValueError("número inválido")))
+    app = crear_app()
+    dispatcher = OutboundDispatcher(max_en_vuelo=1)
+
+    with app.app_context():
+        with pytest.raises(ValueError):
+            dispatcher.enviar_y_esperar("+1", "hola", from_="+100", timeout=5)
+        fila = OutboundDeadLetter.query.one()
+    assert (fila.to_number, fila.from_number, fila.body, fila.intentos) == ("+1", "+100", "hola", 1)
+    assert not dispatcher.dead_letters
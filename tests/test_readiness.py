@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from app import readiness
+
+
+@pytest.fixture
+def componentes(monkeypatch):
+    """
+    Reemplaza el índice y los clientes por banderas; calentar() las enciende.
+    """
+    creados = set()
+    monkeypatch.setattr(readiness, "_estado", {"warmup": "pendiente", "duracion_ms": None, "error": None})
+    monkeypatch.setattr(readiness, "get_coleccion", lambda: creados.add("indice"))
+    monkeypatch.setattr(readiness, "get_llm_client", lambda nombre: creados.add(f"llm:{nombre}"))
+    monkeypatch.setattr(readiness, "get_twilio_client", lambda: creados.add("twilio"))
+    monkeypatch.setattr(readiness, "coleccion_lista", lambda: "indice" in creados)
+    monkeypatch.setattr(readiness, "clientes_iniciados", lambda: set(creados))
+    return creados
+
+
+def _esperar_listo(cliente, segundos=2):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        respuesta = cliente.get("/ready")
+        if respuesta.status_code == 200:
+            return respuesta
+        time.sleep(0.02)
+    return respuesta
+
+
+def test_sin_warmup_al_arrancar_el_primer_ready_lo_lanza(crear_app, componentes, monkeypatch):
+    monkeypatch.setattr(readiness, "WARMUP_ON_START", False)
+    app = crear_app(readiness.bp)
+    readiness.iniciar_warmup(app)
+    assert readiness._estado["warmup"] == "pendiente"
+
+    cliente = app.test_client()
+    assert cliente.get("/ready").status_code == 503
+    respuesta = _esperar_listo(cliente)
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["warmup"] == "completo"
+
+
+def test_warmup_con_error_se_relanza_en_el_siguiente_ready(crear_app, componentes, monkeypatch):
+    fallos = [RuntimeError("twilio no responde")]
+
+    def twilio():
+        if fallos:
+            raise fallos.pop()
+        componentes.add("twilio")
+
+    monkeypatch.setattr(readiness, "get_twilio_client", twilio)
+    cliente = crear_app(readiness.bp).test_client()
+    cliente.get("/ready")
+    limite = time.monotonic() + 2
+    while readiness._estado["warmup"] != "error" and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert readiness._estado["error"] == "twilio no responde"
+    assert _esperar_listo(cliente).status_code == 200
@@ -0,0 +1,79 @@
+from concurrent.futures import Future
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from app import db, reminders
+from app.models import Appointment
+
+
+class DispatcherEspia:
+    """
+    Deja cada envío según `modo`: 'ok' lo resuelve, 'en_cola' no lo empieza y
+    'en_curso' lo marca como iniciado sin terminarlo.
+    """
+
+    def __init__(self, modo):
+        self.modo = modo
+        self.futures = []
+
+    def enviar(self, to, body, from_=None):
+        future = Future()
+        if self.modo == "ok":
+            future.set_result("SM1")
+        elif self.modo == "en_curso":
+            future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+
+@pytest.fixture
+def app_con_citas(crear_app, monkeypatch):
+    monkeypatch.setattr(reminders, "REMINDER_SEND_TIMEOUT_SECONDS", 0.05)
+    app = crear_app()
+    manana = datetime.now() + timedelta(hours=2)
+    with app.app_context():
+        for i in range(3):
+            db.session.add(Appointment(patient_name=f"P{i}", patient_phone=f"+5700{i}", service_type="limpieza",
+                                       date=manana.date(), time=time(manana.hour, i * 10), status="pending"))
+        db.session.commit()
+    return app
+
+
+def _citas():
+    return Appointment.query.order_by(Appointment.id).all()
+
+
+def test_envios_en_cola_al_vencer_la_espera_se_cancelan_y_cuentan_como_fallidos(app_con_citas, monkeypatch):
+    espia = DispatcherEspia("en_cola")
+    monkeypatch.setattr(reminders, "dispatcher", espia)
+    with app_con_citas.app_context():
+        assert reminders.ejecutar_recordatorios() == (0, 3)
+        assert all(f.cancelled() for f in espia.futures)
+        assert [(c.reminder_claim, c.reminder_attempts) for c in _citas()] == [(None, 1)] * 3
+
+
+def test_envios_en_curso_conservan_el_reclamo_hasta_resolverse(app_con_citas, monkeypatch):
+    espia = DispatcherEspia("en_curso")
+    monkeypatch.setattr(reminders, "dispatcher", espia)
+    with app_con_citas.app_context():
+        assert reminders.ejecutar_recordatorios() == (0, 0)
+        assert len(espia.futures) == 3  # no se reclamaron de nuevo en la misma corrida
+        assert all(c.reminder_claim and c.reminder_sent_at is None for c in _citas())
+
+        espia.futures[0].set_result("SM1")
+        espia.futures[1].set_exception(RuntimeError("twilio caído"))
+        db.session.expire_all()
+        primera, segunda, tercera = _citas()
+        assert primera.reminder_sent_at is not None
+        assert (segunda.reminder_claim, segunda.reminder_attempts) == (None, 1)
+        assert tercera.reminder_claim and tercera.reminder_sent_at is None
+
+
+def test_corrida_sin_fallos_no_vuelve_a_reclamar_las_enviadas(app_con_citas, monkeypatch):
+    espia = DispatcherEspia("ok")
+    monkeypatch.setattr(reminders, "dispatcher", espia)
+    with app_con_citas.app_context():
+        assert reminders.ejecutar_recordatorios() == (3, 0)
+        assert reminders.ejecutar_recordatorios() == (0, 0)
+        assert len(espia.futures) == 3
@@ -0,0 +1,63 @@
+import app.whatsapp as whatsapp
+from app.answer_cache import NullAnswerCache
+from app.semantic_cache import SemanticCache
+
+
+class CacheEspia:
+    """Caché semántica que solo registra llamadas; usa la regla real de SemanticCache."""
+
+    habilitado_para = SemanticCache.habilitado_para
+
+    def __init__(self, intenciones_excluidas):
+        self.intenciones_excluidas = set(intenciones_excluidas)
+        self.busquedas, self.guardadas = [], []
+
+    def buscar(self, pregunta):
+        self.busquedas.append(pregunta)
+        return None
+
+    def guardar(self, pregunta, respuesta):
+        self.guardadas.append(pregunta)
+
+
+def _preparar(monkeypatch, cache):
+    monkeypatch.setattr(whatsapp, "get_semantic_cache", lambda: cache)
+    monkeypatch.setattr(whatsapp, "get_answer_cache", NullAnswerCache)
+    monkeypatch.setattr(whatsapp, "recuperar_documentos", lambda pregunta, top_k=3: (["doc_0"], ["texto"]))
+    monkeypatch.setattr(whatsapp, "generar_respuesta", lambda pregunta, docs, saludo="": "respuesta")
+
+
+def test_intencion_excluida_no_busca_ni_guarda(monkeypatch):
+    cache = CacheEspia({"agendar_cita"})
+    _preparar(monkeypatch, cache)
+
+    assert whatsapp.responder_consulta("¿tienen turno el lunes?", intencion="agendar_cita") == "respuesta"
+    assert cache.busquedas == [] and cache.guardadas == []
+
+
+def test_consulta_general_usa_la_cache(monkeypatch):
+    cache = CacheEspia({"agendar_cita"})
+    _preparar(monkeypatch, cache)
+
+    whatsapp.responder_consulta("¿dónde queda la clínica?", intencion="consulta_general")
+    assert cache.busquedas == ["¿dónde queda la clínica?"]
+    assert cache.guardadas == ["¿dónde queda la clínica?"]
+
+
+def test_el_webhook_pasa_la_intencion_detectada(crear_app, monkeypatch):
+    from app.users import Usuario  # noqa: F401  (registra la tabla usuarios)
+
+    app = crear_app(whatsapp.bp)
+    # Una intención distinta de la por defecto, para que solo pase el test si el webhook la propaga
+    cache = CacheEspia({"consultar_mis_citas"})
+    _preparar(monkeypatch, cache)
+    monkeypatch.setattr(whatsapp, "detectar_intencion_llm",
+                        lambda mensaje: {"intencion": "consultar_mis_citas", "entidades": {}})
+    monkeypatch.setattr(whatsapp, "enviar_whatsapp", lambda to_number, body_text: "SM-test")
+    client = app.test_client()
+    numero = "whatsapp:+51900000009"
+
+    # El primer mensaje lleva saludo y nunca usa la caché; el segundo ya no
+    for body in ("hola", "¿en qué calle queda la clínica?"):
+        assert client.post("/whatsapp_webhook", data={"From": numero, "Body": body}).status_code == 200
+    assert cache.busquedas == [] and cache.guardadas == []
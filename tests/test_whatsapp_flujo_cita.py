@@ -0,0 +1,33 @@
+import app.whatsapp as whatsapp
+from app.users import Usuario  # noqa: F401  (registra la tabla usuarios)
+
+
+def test_una_extraccion_por_mensaje(crear_app, monkeypatch):
+    app = crear_app(whatsapp.bp)
+    respuestas = iter([
+        {"intencion": "agendar_cita", "entidades": {"nombre_paciente": "Juan", "doctor": "Dr. Pérez"}},
+        {"intencion": "agendar_cita", "entidades": {"fecha": "2030-12-15"}},
+    ])
+    llamadas = []
+
+    def detectar_llm(mensaje):
+        llamadas.append(mensaje)
+        return next(respuestas)
+
+    monkeypatch.setattr(whatsapp, "detectar_intencion_llm", detectar_llm)
+    monkeypatch.setattr(whatsapp, "enviar_whatsapp", lambda to_number, body_text: "SM-test")
+    client = app.test_client()
+    numero = "whatsapp:+51900000006"
+
+    primer_turno = "Hola, soy Juan y quiero agendar una cita con el Dr. Pérez"
+    r = client.post("/whatsapp_webhook", data={"From": numero, "Body": primer_turno, "MessageSid": "SM1"})
+    assert r.status_code == 200
+    assert llamadas == [primer_turno]
+    # Nombre y doctor salieron de esa única extracción: ya pregunta la fecha
+    assert "fecha" in r.get_json()["mensaje_enviado"]
+
+    segundo_turno = "para el 15 de diciembre de 2030"
+    r = client.post("/whatsapp_webhook", data={"From": numero, "Body": segundo_turno, "MessageSid": "SM2"})
+    assert r.status_code == 200
+    assert llamadas == [primer_turno, segundo_turno]
+    assert "hora" in r.get_json()["mensaje_enviado"]